@@ -1,45 +1,48 @@
+import gc
 import subprocess
-import socket
 import time
 import os
 import signal
 import psutil
 import tkinter as tk
 from tkinter import messagebox
+from threading import Event
+from control_server import ControlServer
+from main import main as run_quality_capture
 
-# GUI to select network interface
+# GUI to select one or more network interfaces; returns the selection once the window is closed
 def select_network_interface_gui():
+    selected = []
+
     def on_select():
-        selected = interface_var.get()
+        selected.extend(interface for interface, var in interface_vars.items() if var.get())
         if selected:
-            root.destroy()  # Close the GUI window
-            start_process(selected)  # Start processes with the selected interface
+            root.destroy()  # Close the GUI window; mainloop() returns and the selection is handed back
         else:
-            messagebox.showwarning("No Selection", "Please select a network interface.")
+            messagebox.showwarning("No Selection", "Please select at least one network interface.")
 
     # Initialize GUI window
     root = tk.Tk()
-    root.title("Select Network Interface")
+    root.title("Select Network Interfaces")
     root.geometry("400x400")  # Set the window size (width x height)
 
-    # Variable to store selected interface, initialized to None
-    interface_var = tk.StringVar()  # Let it be empty initially (no default selection)
-
     interfaces = list(psutil.net_if_addrs().keys())  # Get list of interfaces
 
-    # Set custom font for labels and radio buttons
+    # One variable per interface, all unchecked initially
+    interface_vars = {interface: tk.BooleanVar(value=False) for interface in interfaces}
+
+    # Set custom font for labels and check buttons
     label_font = ("Arial", 14, "bold")  # Font for the main label
-    radio_font = ("Arial", 12)  # Font for each radio button
+    check_font = ("Arial", 12)  # Font for each check button
 
     # Create label for the title
     label = tk.Label(root, text="Available Network Interfaces:", font=label_font)
     label.pack(pady=10)
 
-    # Create radio buttons for each network interface with increased font size
+    # Create check buttons so media moving between Wi-Fi, Ethernet and VPN can be captured together
     for interface in interfaces:
-        rb = tk.Radiobutton(root, text=interface, variable=interface_var, value=interface, font=radio_font)
-        rb.deselect()  # Explicitly ensure all are deselected at the start
-        rb.pack(anchor="w")
+        cb = tk.Checkbutton(root, text=interface, variable=interface_vars[interface], font=check_font)
+        cb.pack(anchor="w")
 
     # Add a button to confirm selection with increased font size
     select_button = tk.Button(root, text="Select", command=on_select, font=("Arial", 12))
@@ -47,9 +50,16 @@ def select_network_interface_gui():
 
     # Start the Tkinter event loop
     root.mainloop()
+    return selected
+
+# Step 2: Start Selenium and QualityCapture with the selected interfaces
+def start_process(selected_interfaces):
+    # One control server for the whole session: Selenium's "Start" and "Stop", and commands from external tools
+    control = ControlServer()
+    call_started = Event()
+    control.register('start', lambda message: call_started.set())
+    control.start()
 
-# Step 2: Start Selenium and QualityCapture processes with the selected interface
-def start_process(selected_interface):
     # Step 1: Run the Selenium JAR file to start the call
     selenium_process = subprocess.Popen(
         ['java', '-jar', 'TeamsSelenium.jar'],
@@ -59,35 +69,20 @@ def start_process(selected_interface):
     print("Selenium JAR started, making the call...")
 
     # Step 2: Wait for call start signal from Selenium
-    def wait_for_call_start():
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            server_socket.bind(('localhost', 9999))
-            server_socket.listen(1)
-            print("Waiting for call start signal from Selenium...")
+    try:
+        print("Waiting for call start signal from Selenium...")
+        call_started.wait()
+        print("Call has started. Beginning quality analysis...")
+        time.sleep(5)  # Buffer time before starting QualityCapture
 
-            conn, addr = server_socket.accept()
-            with conn:
-                data = conn.recv(1024).decode()
-                if data == "Start":
-                    print("Call has started. Beginning quality analysis...")
-                    server_socket.close()
-                    time.sleep(5)  # Buffer time before starting QualityCapture
-
-                    # Step 3: Run the QualityCapture process with selected interface as an argument
-                    quality_capture_process = subprocess.Popen(['python', 'main.py', selected_interface])
-
-                    # Wait for the QualityCapture process to finish
-                    quality_capture_process.wait()
-                    print("QualityCapture process terminated.")
-
-        except Exception as e:
-            print(f"Error occurred: {e}")
-        finally:
-            server_socket.close()
+        # Step 3: Run QualityCapture on the selected interfaces, sharing the control server
+        run_quality_capture(selected_interfaces, control=control)
+        print("QualityCapture process terminated.")
 
-    # Wait for the call to start before proceeding
-    wait_for_call_start()
+    except Exception as e:
+        print(f"Error occurred: {e}")
+    finally:
+        control.close()
 
     # Step 4: Ensure all child processes of Selenium are terminated
     def terminate_process_and_children(process):
@@ -108,4 +103,11 @@ def start_process(selected_interface):
 
 
 # Initialize the GUI for selecting the network interface
-select_network_interface_gui()
+selected_interfaces = select_network_interface_gui()
+
+# QualityCapture runs in this process and creates its own Tk window and plots on worker threads. Tcl interpreters
+# must be deleted by the thread that created them, so the selection window is fully released here on the main
+# thread (its widgets and callbacks form reference cycles) before any capture thread starts
+gc.collect()
+if selected_interfaces:
+    start_process(selected_interfaces)
@@ -0,0 +1,261 @@
+import json
+import socket
+import time
+import urllib.request
+from queue import Queue, Full
+from threading import Thread
+
+# Direction in which each metric degrades: bitrate falls, jitter and latency rise
+METRIC_DIRECTIONS = (('bitrate', -1), ('jitter', 1), ('latency', 1))
+
+
+class _MetricState:
+    """EWMA baseline and one-sided CUSUM statistic of a single metric."""
+    __slots__ = ('mean', 'var', 'squares', 'cusum', 'count')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forgets the baseline so it is learned again from the next observations."""
+        self.mean = 0.0
+        self.var = 0.0
+        self.squares = 0.0  # Sum of squared differences from the mean during the warmup (Welford)
+        self.cusum = 0.0
+        self.count = 0
+
+
+class _FlowState:
+    """Detector state of one flow: a fixed number of metric states plus the debounce counters."""
+    __slots__ = ('metrics', 'reported', 'pending', 'streak', 'last_seen')
+
+    def __init__(self):
+        self.metrics = tuple(_MetricState() for _ in METRIC_DIRECTIONS)
+        self.reported = set()  # Metrics reported as degraded; empty while the flow is healthy
+        self.pending = None  # Event the streak counts towards
+        self.streak = 0
+        self.last_seen = 0.0
+
+
+class ChangeDetector:
+    """
+    Online change-point detection on per-flow bitrate, jitter and latency. Each metric keeps an EWMA baseline and a
+    one-sided CUSUM of its standardized deviation in the degrading direction. A flow is reported as degraded when any
+    CUSUM exceeds the threshold for `confirm` consecutive observations, and as recovered when all metrics have been
+    back near their baseline for as long. State per flow is constant, so the detector scales to hundreds of flows.
+
+    The baseline is learned over the first `warmup` observations with Welford's unbiased mean and variance, then
+    followed by the EWMAs. Both see the noise on either side of the mean, with differences clipped to `clip` standard
+    deviations so a single outlier or a change moves them only a little. The mean stops following a metric once its
+    CUSUM exceeds the threshold, so a degradation is not learned as normal.
+
+    Once a degradation is confirmed, the changed metrics learn their baseline again from the following observations.
+    A permanent level shift (e.g., the call moving to a lower resolution) is therefore reported once, followed by a
+    recovery when the flow is stable at its new level, and later changes are measured against that level. A metric
+    that changes while the flow is already degraded is reported with a further degradation event.
+    """
+
+    def __init__(self, sinks=(), alpha=0.1, slack=0.5, threshold=5.0, warmup=10, confirm=2, min_std=(50000, 2, 5),
+                 flow_timeout=60, clip=3.0):
+        """
+        Args:
+            sinks (iterable): Callables receiving each event as a dict.
+            alpha (float): Smoothing factor of the EWMA baselines.
+            slack (float): CUSUM allowance in standard deviations; smaller drifts are ignored.
+            threshold (float): CUSUM value at which a metric is considered changed.
+            warmup (int): Observations used to learn a flow's baseline before detecting.
+            confirm (int): Consecutive observations needed before a state change is reported.
+            min_std (tuple): Lower bound of the standard deviation per metric (bps, ms, ms).
+            flow_timeout (float): Seconds after which a silent flow's state is dropped.
+            clip (float): Standard deviations at which differences are clipped when updating the variance.
+        """
+        self.sinks = list(sinks)
+        self.alpha = alpha
+        self.slack = slack
+        self.threshold = threshold
+        self.warmup = warmup
+        self.confirm = confirm
+        self.min_std = min_std
+        self.flow_timeout = flow_timeout
+        self.clip = clip
+        self._flows = {}
+
+    def update(self, key, bitrate, jitter, latency, timestamp=None):
+        """
+        Feeds one observation of a flow and emits an event if its state changed.
+
+        Args:
+            key (tuple): Conversation key of the flow.
+            bitrate (float): Bitrate in bps.
+            jitter (float): Jitter in milliseconds.
+            latency (float): Latency in milliseconds.
+            timestamp (float): Observation time, defaults to the current time.
+
+        Returns:
+            dict: The emitted event, or None.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = self._flows[key] = _FlowState()
+        flow.last_seen = timestamp
+        return self._observe(key, flow, (bitrate, jitter, latency), timestamp, True)
+
+    def update_missing(self, seen, timestamp=None):
+        """
+        Feeds a zero-bitrate observation to every known flow that had no packets in the interval, so a flow that went
+        silent is reported as degraded before it expires. Jitter and latency cannot be measured without packets and
+        are taken at their baselines. Silent observations are never learned as a baseline.
+
+        Args:
+            seen (collection): Keys of the flows observed in the interval.
+            timestamp (float): Observation time, defaults to the current time.
+
+        Returns:
+            list: The emitted events.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        for key, flow in list(self._flows.items()):
+            if key in seen:
+                continue
+            values = (0.0,) + tuple(state.mean for state in flow.metrics[1:])
+            event = self._observe(key, flow, values, timestamp, False)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _observe(self, key, flow, values, timestamp, learn):
+        degraded = set()
+        for state, (name, direction), min_std, value in zip(flow.metrics, METRIC_DIRECTIONS, self.min_std, values):
+            if state.count < self.warmup:
+                if name in flow.reported:
+                    degraded.add(name)  # Re-learning after a degradation: not recovered until the baseline is known
+                if learn:
+                    state.count += 1
+                    difference = value - state.mean
+                    state.mean += difference / state.count
+                    state.squares += difference * (value - state.mean)
+                    state.var = state.squares / (state.count - 1) if state.count > 1 else 0.0
+                continue
+
+            std = max(state.var ** 0.5, min_std)
+            deviation = direction * (value - state.mean) / std
+            if state.cusum > self.threshold and deviation <= self.slack:
+                state.cusum = 0.0  # Back at the baseline, recover without waiting for the sum to drain
+            else:
+                state.cusum = max(0.0, state.cusum + deviation - self.slack)
+            if state.cusum > self.threshold:
+                degraded.add(name)
+            if learn:
+                difference = value - state.mean
+                clipped = max(-self.clip * std, min(self.clip * std, difference))
+                state.var = (1 - self.alpha) * (state.var + self.alpha * clipped * clipped)
+                if state.cusum <= self.threshold:
+                    state.mean += self.alpha * clipped
+
+        new = degraded - flow.reported
+        if new:
+            pending = 'degradation'
+        elif flow.reported and not degraded:
+            pending = 'recovery'
+        else:
+            pending = None
+        if pending is None or pending != flow.pending:
+            flow.pending = pending
+            flow.streak = 0
+        if pending is None:
+            return None
+        flow.streak += 1
+        if flow.streak < self.confirm:
+            return None
+
+        flow.pending = None
+        flow.streak = 0
+        if pending == 'degradation':
+            changed = [name for name, _ in METRIC_DIRECTIONS if name in new]
+            flow.reported |= new
+            # Learn the new level of the changed metrics, so a permanent shift does not keep the flow degraded
+            for state, (name, _) in zip(flow.metrics, METRIC_DIRECTIONS):
+                if name in new:
+                    state.reset()
+        else:
+            changed = []
+            flow.reported.clear()
+        event = {
+            'event': pending,
+            'flow': list(key),
+            'metrics': changed,
+            'bitrate': values[0],
+            'jitter': values[1],
+            'latency': values[2],
+            'time': timestamp,
+        }
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"Error delivering alert: {e}")
+        return event
+
+    def expire(self, now=None):
+        """Drops the state of flows that have not been observed for flow_timeout seconds."""
+        now = time.time() if now is None else now
+        for key in [key for key, flow in self._flows.items() if now - flow.last_seen > self.flow_timeout]:
+            del self._flows[key]
+
+
+def print_sink(event):
+    """Prints an event to the console."""
+    print(f"ALERT {event['event']} on {tuple(event['flow'])}: {', '.join(event['metrics']) or 'all metrics normal'}")
+
+
+class LogFileSink:
+    """Appends events as JSON lines to a log file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        with open(self.path, 'a', encoding='utf-8') as log:
+            log.write(json.dumps(event) + '\n')
+
+
+class SocketSink:
+    """Sends each event as a JSON datagram to a local UDP socket."""
+
+    def __init__(self, host, port):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, event):
+        self.sock.sendto(json.dumps(event).encode('utf-8'), self.address)
+
+
+class WebhookSink:
+    """
+    Posts events as JSON to an HTTP endpoint from a background thread, so a slow endpoint never delays scoring.
+    Events are dropped when more than `max_pending` are waiting.
+    """
+
+    def __init__(self, url, timeout=2, max_pending=100):
+        self.url = url
+        self.timeout = timeout
+        self._pending = Queue(maxsize=max_pending)
+        Thread(target=self._post_events, daemon=True).start()
+
+    def __call__(self, event):
+        try:
+            self._pending.put_nowait(event)
+        except Full:
+            print("Alert webhook backlog full, dropping event")
+
+    def _post_events(self):
+        while True:
+            event = self._pending.get()
+            request = urllib.request.Request(self.url, data=json.dumps(event).encode('utf-8'),
+                                             headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+            except Exception as e:
+                print(f"Error posting alert to {self.url}: {e}")
@@ -0,0 +1,86 @@
+import argparse
+import random
+import sys
+from change_detection import ChangeDetector
+
+duration = 2  # Seconds per analysis interval, as in main.py
+max_false_alarms = 0.05  # Accepted false degradations per flow per 5 minutes of stationary traffic
+
+
+def run(intervals, bitrate, jitter, latency, seed):
+    """
+    Feeds one flow to a fresh detector.
+
+    Args:
+        intervals (int): Number of observations.
+        bitrate, jitter, latency (callable): Called with (random.Random, interval index), return the metric value.
+        seed (int): Seed of the noise.
+
+    Returns:
+        list: The emitted events, with the interval index as their time.
+    """
+    rng = random.Random(seed)
+    detector = ChangeDetector()
+    events = []
+    for index in range(intervals):
+        event = detector.update('flow', bitrate(rng, index), jitter(rng, index), latency(rng, index), index)
+        if event is not None:
+            events.append(event)
+    return events
+
+
+def false_alarm_rate(name, noise, seeds, intervals=150):
+    """Prints and returns the false degradations per flow per 5 minutes of stationary traffic with the given noise."""
+    degradations = 0
+    per_metric = {}
+    for seed in range(seeds):
+        for event in run(intervals, lambda rng, _: 2000000 * (1 + noise(rng)), lambda rng, _: 5 * (1 + noise(rng)),
+                         lambda rng, _: 20 * (1 + noise(rng)), seed):
+            if event['event'] == 'degradation':
+                degradations += 1
+                for metric in event['metrics']:
+                    per_metric[metric] = per_metric.get(metric, 0) + 1
+    rate = degradations / seeds * 300 / (intervals * duration)
+    print(f"Stationary {name}: {rate:.3f} false degradations per flow per 5 min over {seeds} flows {per_metric}")
+    return rate
+
+
+def detection_delay(name, seeds, intervals, change_at, bitrate=None, jitter=None, wanted=None):
+    """Prints the share of flows whose change was reported and the mean number of intervals it took."""
+    delays = []
+    for seed in range(seeds):
+        for event in run(intervals,
+                         bitrate or (lambda rng, _: 2000000 * rng.gauss(1, 0.05)),
+                         jitter or (lambda rng, _: 5 * rng.gauss(1, 0.05)),
+                         lambda rng, _: 20 * rng.gauss(1, 0.05), seed):
+            if event['event'] == 'degradation' and wanted in event['metrics'] and event['time'] >= change_at:
+                delays.append(event['time'] - change_at)
+                break
+    mean = sum(delays) / len(delays) if delays else float('nan')
+    print(f"{name}: detected in {len(delays)}/{seeds} flows after {mean:.1f} intervals on average")
+    return len(delays) / seeds
+
+
+if __name__ == '__main__':
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="False alarm rate and detection delay of the change detector")
+    parser.add_argument("--seeds", type=int, default=100, help="Simulated flows per scenario")
+    args = parser.parse_args()
+
+    rates = [false_alarm_rate("gaussian 5% noise", lambda rng: rng.gauss(0, 0.05), args.seeds),
+             false_alarm_rate("uniform 10% noise", lambda rng: rng.uniform(-0.1, 0.1), args.seeds)]
+    detected = [
+        detection_delay("Bitrate drop to 50% at interval 60", args.seeds, 90, 60,
+                        bitrate=lambda rng, index: 2000000 * rng.gauss(1, 0.05) * (0.5 if index >= 60 else 1),
+                        wanted='bitrate'),
+        detection_delay("Jitter rise to 15 ms at interval 60", args.seeds, 90, 60,
+                        jitter=lambda rng, index: (15 if index >= 60 else 5) * rng.gauss(1, 0.05), wanted='jitter'),
+        detection_delay("Jitter rise to 15 ms 6 intervals after a bitrate drop", args.seeds, 90, 66,
+                        bitrate=lambda rng, index: 2000000 * rng.gauss(1, 0.05) * (0.5 if index >= 60 else 1),
+                        jitter=lambda rng, index: (15 if index >= 66 else 5) * rng.gauss(1, 0.05), wanted='jitter'),
+    ]
+
+    if max(rates) > max_false_alarms or min(detected) < 0.95:
+        print(f"FAIL: more than {max_false_alarms} false alarms per flow per 5 min, or changes missed")
+        sys.exit(1)
+    print(f"OK: at most {max_false_alarms} false alarms per flow per 5 min, 95% of changes detected")
@@ -0,0 +1,135 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import socketserver
+from threading import Lock
+from summary_protocol import ACK, BATCH_HEADER, MAGIC, RECORD, unpack_record
+
+
+class Timelines:
+    """
+    Per-call timelines merged from the summaries of all probes. Records are kept ordered by interval time, and
+    batches a probe resends after a reconnect are ignored by their session and sequence number.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls = {}
+        self._times = {}  # Interval times of each call's records, kept alongside them for bisect
+        self._last_sequence = {}
+        self.records_received = 0
+
+    def add_batch(self, probe_id, call_id, session, sequence, records):
+        """
+        Adds the records of one batch to the call's timeline.
+
+        Args:
+            probe_id (str): Probe that sent the batch.
+            call_id (str): Call the batch belongs to.
+            session (int): Random number identifying the exporter process that produced the batch.
+            sequence (int): Sequence number of the batch within its session, starting at 1.
+            records (list): Records as returned by unpack_record.
+
+        Returns:
+            bool: False if the batch was already received.
+        """
+        with self._lock:
+            if sequence <= self._last_sequence.get((probe_id, call_id, session), 0):
+                return False
+            self._last_sequence[(probe_id, call_id, session)] = sequence
+            timeline = self._calls.setdefault(call_id, [])
+            times = self._times.setdefault(call_id, [])
+            for record in records:
+                record['probe'] = probe_id
+                if not times or times[-1] <= record['time']:
+                    timeline.append(record)  # Records usually arrive in order
+                    times.append(record['time'])
+                else:
+                    index = bisect.bisect_right(times, record['time'])
+                    timeline.insert(index, record)
+                    times.insert(index, record['time'])
+            self.records_received += len(records)
+            return True
+
+    def timeline(self, call_id):
+        """Returns a copy of the call's records ordered by interval time."""
+        with self._lock:
+            return list(self._calls.get(call_id, []))
+
+    def calls(self):
+        """Returns the identifiers of all calls seen so far."""
+        with self._lock:
+            return list(self._calls)
+
+    def save(self, output_dir):
+        """Writes one JSON file per call with its merged timeline."""
+        os.makedirs(output_dir, exist_ok=True)
+        for call_id in self.calls():
+            path = os.path.join(output_dir, re.sub(r'[^\w.-]', '_', call_id) + '.json')
+            with open(path, 'w', encoding='utf-8') as output:
+                json.dump(self.timeline(call_id), output)
+            print(f"Saved timeline of call {call_id} to {path}")
+
+
+class ProbeHandler(socketserver.StreamRequestHandler):
+    """Receives the summaries of one probe connection and acknowledges every batch once it is stored."""
+
+    def _read_text(self):
+        length = self.rfile.read(1)
+        if not length:
+            raise EOFError
+        return self.rfile.read(length[0]).decode('utf-8', errors='replace')
+
+    def handle(self):
+        try:
+            if self.rfile.read(len(MAGIC)) != MAGIC:
+                return
+            probe_id = self._read_text()
+            call_id = self._read_text()
+        except EOFError:
+            return
+        print(f"Probe {probe_id} connected for call {call_id}")
+
+        while True:
+            header = self.rfile.read(BATCH_HEADER.size)
+            if len(header) < BATCH_HEADER.size:
+                break
+            session, sequence, count = BATCH_HEADER.unpack(header)
+            payload = self.rfile.read(count * RECORD.size)
+            if len(payload) < count * RECORD.size:
+                break
+            records = [unpack_record(payload, offset) for offset in range(0, len(payload), RECORD.size)]
+            self.server.timelines.add_batch(probe_id, call_id, session, sequence, records)
+            self.wfile.write(ACK.pack(sequence))
+        print(f"Probe {probe_id} disconnected")
+
+
+class Collector(socketserver.ThreadingTCPServer):
+    """TCP server merging the summaries pushed by probes into per-call timelines."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, ProbeHandler)
+        self.timelines = Timelines()
+
+
+if __name__ == '__main__':
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Collector for the interval summaries of quality capture probes")
+    parser.add_argument("--host", default="localhost", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=9100, help="Port to listen on")
+    parser.add_argument("--output-dir", default="timelines", help="Directory receiving the per-call timelines")
+    args = parser.parse_args()
+
+    collector = Collector((args.host, args.port))
+    print(f"Collecting probe summaries on {args.host}:{args.port}...")
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.server_close()
+        collector.timelines.save(args.output_dir)
@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from threading import Thread
+from collector import Collector
+from probe_exporter import ProbeExporter
+from summary_protocol import BATCH_HEADER, MAGIC, RECORD, pack_hello
+
+FLOW = ('192.168.1.10', '52.112.0.1', 50000, 3478)
+
+
+def start_collector():
+    """Starts a collector on a free loopback port and returns it with its port."""
+    collector = Collector(('localhost', 0))
+    Thread(target=collector.serve_forever, daemon=True).start()
+    return collector, collector.server_address[1]
+
+
+def export(port, probe_id, call_id, records, host='localhost', **options):
+    """Runs one exporter that sends `records` summaries of FLOW and stops once they are delivered or spooled."""
+    exporter = ProbeExporter(host, port, probe_id, call_id, **options)
+    for index in range(records):
+        exporter.add(1000.0 + index, FLOW, 100, 120000, 480000.0, 3.0, 20.0, 8)
+    exporter.stop()
+
+
+def loopback_check():
+    """
+    Checks the exporter and collector end to end on the loopback interface: records of a restarted probe and
+    records replayed from the spool of an earlier process must all reach the timeline exactly once.
+
+    Returns:
+        bool: True if every check passed.
+    """
+    collector, port = start_collector()
+    spool_path = os.path.join(tempfile.mkdtemp(), 'spool.bin')
+    passed = True
+
+    def expect(description, expected):
+        nonlocal passed
+        received = len(collector.timelines.timeline('check'))
+        ok = received == expected
+        passed = passed and ok
+        print(f"{'OK  ' if ok else 'FAIL'} {description}: {received} records, expected {expected}")
+
+    try:
+        export(port, 'probe', 'check', 5, spool_path=spool_path)
+        expect("first run", 5)
+        export(port, 'probe', 'check', 5, spool_path=spool_path)
+        expect("restarted probe", 10)
+        # Port 1 is closed on loopback, so this run spools everything
+        export(1, 'probe', 'check', 3, spool_path=spool_path)
+        expect("collector unreachable", 10)
+        export(port, 'probe', 'check', 2, spool_path=spool_path)
+        expect("spool replayed by the next run", 15)
+        if os.path.exists(spool_path):
+            passed = False
+            print("FAIL spool was not removed after the replay")
+        timeline = collector.timelines.timeline('check')
+        if any(earlier['time'] > later['time'] for earlier, later in zip(timeline, timeline[1:])):
+            passed = False
+            print("FAIL timeline is not ordered by interval time")
+    finally:
+        collector.shutdown()
+        collector.server_close()
+    return passed
+
+
+def benchmark(probes=4, records=50000, flows=4, interval=2):
+    """
+    Prints the bandwidth one probe needs and the number of records per second the collector merges.
+
+    Args:
+        probes (int): Probes pushing records in parallel.
+        records (int): Records sent by each probe.
+        flows (int): Tracked flows per probe used for the bandwidth figure.
+        interval (float): Seconds between two summaries of a flow, the analysis duration of main.py.
+    """
+    # One batch per flush interval (1 s) carries the records of every interval that ended in it
+    per_second = flows / interval * RECORD.size + BATCH_HEADER.size
+    hello = len(pack_hello('probe', 'call'))
+    print(f"Record {RECORD.size} B, batch header {BATCH_HEADER.size} B, hello {hello} B ({len(MAGIC)} B magic)")
+    print(f"Bandwidth for {flows} flows every {interval}s: {per_second:.0f} B/s per probe")
+
+    collector, port = start_collector()
+    try:
+        threads = [Thread(target=export, args=(port, f"probe{index}", 'benchmark', records),
+                          kwargs={'spool_path': os.path.join(tempfile.mkdtemp(), 'spool.bin')})
+                   for index in range(probes)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        received = collector.timelines.records_received
+    finally:
+        collector.shutdown()
+        collector.server_close()
+    print(f"{probes} probes x {records} records: {received} received in {elapsed:.2f}s, "
+          f"{received / elapsed:,.0f} records/s")
+
+
+if __name__ == '__main__':
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Loopback check and benchmark of the probe exporter and collector")
+    parser.add_argument("--check-only", action="store_true", help="Run the loopback check without the benchmark")
+    parser.add_argument("--probes", type=int, default=4, help="Probes pushing records in parallel")
+    parser.add_argument("--records", type=int, default=50000, help="Records sent by each probe")
+    args = parser.parse_args()
+
+    if not loopback_check():
+        sys.exit(1)
+    if not args.check_only:
+        benchmark(args.probes, args.records)
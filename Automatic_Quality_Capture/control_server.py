@@ -0,0 +1,279 @@
+import json
+import selectors
+import socket
+import struct
+from collections import deque
+from threading import Thread
+
+# Frames are a 4-byte big-endian length followed by a UTF-8 JSON object:
+#   request: {"id": 1, "cmd": "stats", ...}     reply: {"id": 1, "ok": true, ...}
+#   event:   {"topic": "results", "data": ...}  sent to connections that subscribed to the topic
+# The Selenium driver's plain "Start" and "Stop" messages are accepted as well and mapped to the same commands.
+FRAME_HEADER = struct.Struct('!I')
+MAX_FRAME = 1024 * 1024
+MAX_BACKLOG = 4 * 1024 * 1024  # Unsent bytes after which a connection that does not read is closed
+LEGACY_COMMANDS = {b'Start': 'start', b'Stop': 'stop'}
+
+
+def encode_frame(message):
+    """Returns the framed bytes of a JSON message."""
+    payload = json.dumps(message).encode('utf-8')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class _Connection:
+    __slots__ = ('sock', 'inbuf', 'outbuf', 'legacy')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b''
+        self.outbuf = b''
+        self.legacy = None  # Decided from the first bytes: plain text command or framed protocol
+
+
+class ControlServer:
+    """
+    Long-lived control server shared by the Selenium driver, Crouler, main and external tools. A single thread waits
+    on all sockets with a selector and handles each message as soon as it arrives, without any polling timeout.
+
+    Commands are dispatched to handlers registered with register(). Connections can subscribe to topics, and every
+    message passed to publish() is pushed to the subscribers; the latest message of each topic is kept for queries.
+    A connection whose unsent data exceeds MAX_BACKLOG is closed, so a subscriber that stops reading cannot make the
+    server buffer every result of the call.
+    """
+
+    def __init__(self, host='localhost', port=9999):
+        self._selector = selectors.DefaultSelector()
+        self._listener = socket.create_server((host, port))
+        self._listener.setblocking(False)
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+        self._handlers = {}
+        self._subscribers = {}
+        self._last = {}
+        self._pending = deque()
+        self._running = True
+        self._thread = Thread(target=self._serve, daemon=True)
+        print(f"Control server listening on {host}:{port}...")
+
+    def start(self):
+        """Starts the server thread."""
+        self._thread.start()
+
+    def close(self):
+        """Stops the server thread and closes all connections."""
+        self._running = False
+        self._wake()
+        self._thread.join()
+        for key in list(self._selector.get_map().values()):
+            key.fileobj.close()
+        self._selector.close()
+        self._wake_writer.close()
+
+    def register(self, command, handler):
+        """
+        Registers the handler of a command, replacing any previous one.
+
+        Args:
+            command (str): Command name, e.g. "stop".
+            handler (callable): Called with the request dict from the server thread; it must not block. It returns a
+                dict of reply fields or None.
+        """
+        self._handlers[command] = handler
+
+    def publish(self, topic, data):
+        """Pushes data to the subscribers of a topic. Safe to call from any thread."""
+        self._last[topic] = data
+        self._pending.append((topic, data))
+        self._wake()
+
+    def last(self, topic):
+        """Returns the latest data published on a topic, or None."""
+        return self._last.get(topic)
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # A wake-up is already pending or the server is closing
+
+    def _serve(self):
+        while self._running:
+            for key, events in self._selector.select():
+                if key.fileobj is self._listener:
+                    self._accept()
+                elif key.fileobj is self._wake_reader:
+                    self._drain_wake()
+                else:
+                    if events & selectors.EVENT_READ:
+                        self._read(key.data)
+                    if events & selectors.EVENT_WRITE and key.data.sock.fileno() != -1:
+                        self._flush(key.data)
+
+    def _accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._selector.register(sock, selectors.EVENT_READ, _Connection(sock))
+
+    def _drain_wake(self):
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        while self._pending:
+            topic, data = self._pending.popleft()
+            frame = encode_frame({'topic': topic, 'data': data})
+            for connection in list(self._subscribers.get(topic, ())):
+                self._send(connection, frame)
+
+    def _close(self, connection):
+        for subscribers in self._subscribers.values():
+            subscribers.discard(connection)
+        try:
+            self._selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+        connection.sock.close()
+
+    def _read(self, connection):
+        try:
+            data = connection.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            if connection.legacy is not False:
+                self._dispatch_legacy(connection)
+            self._close(connection)
+            return
+        connection.inbuf += data
+
+        if connection.legacy is None and len(connection.inbuf) >= FRAME_HEADER.size:
+            connection.legacy = any(command.startswith(connection.inbuf[:FRAME_HEADER.size])
+                                    for command in LEGACY_COMMANDS)
+        if connection.legacy:
+            self._dispatch_legacy(connection)
+            return
+
+        while len(connection.inbuf) >= FRAME_HEADER.size:
+            length = FRAME_HEADER.unpack_from(connection.inbuf)[0]
+            if length > MAX_FRAME:
+                self._close(connection)
+                return
+            end = FRAME_HEADER.size + length
+            if len(connection.inbuf) < end:
+                break
+            payload, connection.inbuf = connection.inbuf[FRAME_HEADER.size:end], connection.inbuf[end:]
+            try:
+                message = json.loads(payload)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                self._send(connection, encode_frame({'ok': False, 'error': 'expected a JSON object'}))
+                continue
+            self._send(connection, encode_frame(self._dispatch(connection, message)))
+
+    def _dispatch_legacy(self, connection):
+        command = LEGACY_COMMANDS.get(connection.inbuf.strip())
+        if command is not None:
+            connection.inbuf = b''
+            self._dispatch(connection, {'cmd': command})
+
+    def _dispatch(self, connection, message):
+        reply = {'id': message.get('id'), 'ok': True}
+        command = message.get('cmd')
+        if command in ('subscribe', 'unsubscribe'):
+            subscribers = self._subscribers.setdefault(message.get('topic'), set())
+            if command == 'subscribe':
+                subscribers.add(connection)
+                reply['data'] = self._last.get(message.get('topic'))
+            else:
+                subscribers.discard(connection)
+            return reply
+
+        handler = self._handlers.get(command)
+        if handler is None:
+            return {'id': message.get('id'), 'ok': False, 'error': f"unknown command {command!r}"}
+        try:
+            reply.update(handler(message) or {})
+        except Exception as e:
+            return {'id': message.get('id'), 'ok': False, 'error': str(e)}
+        return reply
+
+    def _send(self, connection, frame):
+        if connection.sock.fileno() == -1:
+            return  # Closed earlier in this round
+        if len(connection.outbuf) + len(frame) > MAX_BACKLOG:
+            print("Closing control connection that is not reading its messages")
+            self._close(connection)
+            return
+        connection.outbuf += frame
+        self._flush(connection)
+
+    def _flush(self, connection):
+        try:
+            sent = connection.sock.send(connection.outbuf)
+            connection.outbuf = connection.outbuf[sent:]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._close(connection)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if connection.outbuf else 0)
+        self._selector.modify(connection.sock, events, connection)
+
+
+class ControlClient:
+    """Blocking client of the control server, for scripts and external tools."""
+
+    def __init__(self, host='localhost', port=9999, timeout=5):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._next_id = 0
+        self._events = deque()
+
+    def _receive_frame(self):
+        header = self._recv_exact(FRAME_HEADER.size)
+        return json.loads(self._recv_exact(FRAME_HEADER.unpack(header)[0]))
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("control server closed the connection")
+            data += chunk
+        return data
+
+    def request(self, command, **params):
+        """
+        Sends a command and waits for its reply. Events that arrive in between are kept for receive().
+
+        Returns:
+            dict: The reply.
+        """
+        self._next_id += 1
+        self.sock.sendall(encode_frame({'id': self._next_id, 'cmd': command, **params}))
+        while True:
+            message = self._receive_frame()
+            if 'topic' in message:
+                self._events.append(message)
+            elif message.get('id') == self._next_id:
+                return message
+
+    def receive(self):
+        """Waits for the next event of a subscribed topic and returns it as {"topic": ..., "data": ...}."""
+        if self._events:
+            return self._events.popleft()
+        return self._receive_frame()
+
+    def close(self):
+        self.sock.close()
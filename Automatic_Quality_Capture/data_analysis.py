@@ -1,151 +1,217 @@
 import time
-from collections import defaultdict
+import queue
 from packet_capture import parse_line, find_largest_streams
-from quality_calculations import calculate_quality, calculateLatency, calculateJitter
+from flow_table import FlowTable
+from media_classifier import MediaClassifier, pick_stream
+from quality_calculations import BITRATE_SCALE, calculate_quality, calculateLatency, calculateJitter
 import select
 
 # Define the interval duration for data processing
 duration = 2
 
-def analyzeData(process, outgoingStream, incomingStream, data_dict, lock, notify, shutdown_flag, myIp):
+def publish_latest(slot, item):
+    """
+    Places an item into a single-slot queue, replacing any item the consumer has not picked up yet. The producer never
+    blocks, and the consumer always receives the most recent item.
+
+    Args:
+        slot (queue.Queue): Queue created with maxsize=1 used as the handoff slot.
+        item: The object to hand off. It must not be modified after publishing.
+    """
+    while True:
+        try:
+            slot.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                slot.get_nowait()  # Drop the stale item nobody consumed
+            except queue.Empty:
+                pass
+
+
+def analyzeData(capture, outgoingStream, incomingStream, snapshot_queue, shutdown_flag, myIp, packet_ring=None,
+                pause_flag=None):
     """
     Continuously analyzes network data to identify and monitor video streams, processing and tracking packet sizes,
     arrival times, and data volume per stream. The function also detects low bitrate streams and updates the
     outgoing/incoming streams as needed.
 
     Args:
-        process (subprocess): Process output to read data packets from.
+        capture (list): Single-element list holding the capture process to read packets from. The element is
+            replaced when the capture is switched to other interfaces.
         outgoingStream (tuple): Current largest outgoing stream IP pair.
         incomingStream (tuple): Current largest incoming stream IP pair.
-        data_dict (dict): Shared dictionary storing packet information per conversation.
-        lock (threading.Lock): Lock for safely accessing shared data across threads.
-        notify (list): Flag list to signal updates for network quality calculations.
+        snapshot_queue (queue.Queue): Single-slot queue receiving an immutable snapshot of each interval's aggregates.
         shutdown_flag (list): Shutdown signal flag list to terminate the function.
-        myIp (list): List of IPv4 and IPv6 addresses representing the host.
+        myIp (LocalAddresses): Local IPv4 and IPv6 addresses of the capture interface.
+        packet_ring (PacketRing): Optional buffer receiving the raw lines of the tracked streams.
+        pause_flag (list): Optional flag list; packets are read but ignored while it is set.
 
     Variables:
-        temporary_dict (defaultdict): Tracks per-stream packet details temporarily.
-        sent_timestamps (defaultdict): Stores outgoing packet send times for latency calculations.
-        inStreamDict, outStreamDict (defaultdict): Track incoming and outgoing traffic volumes.
+        flows (FlowTable): Tracks per-stream packet details and untracked traffic volumes for the current interval.
+        pair_media, flow_media (MediaClassifier): Media type classification of local address pairs and tracked flows.
+            Tracked flows keep their media label once they had one, so a degrading call is not dropped from scoring.
     """
-    temporary_dict = defaultdict(lambda: (0, 0, [], None))
-    sent_timestamps = defaultdict(list)
+    flows = FlowTable()
+    pair_media = MediaClassifier()
+    flow_media = MediaClassifier(sticky=True)  # Degraded video keeps being scored as video
     start_time = time.time()
-    inStreamDict = defaultdict(int)
-    outStreamDict = defaultdict(int)
+    incoming_pair = flows.pair_key(*incomingStream)
+    outgoing_pair = flows.pair_key(*outgoingStream)
 
     while True:
         output = ''
         start_read_time = time.time()
+        process = capture[0]
 
         # Attempt to read data for up to 2 seconds
         while time.time() - start_read_time < 2:
             output = process.stdout.readline()
-            if output != '':  # Data received
+            if output != '' or process.poll() is not None:  # Data received or capture ended
                 break
             time.sleep(0.1)  # Reduce CPU usage by pausing briefly
 
-        # Exit if the process has terminated
+        # Exit if the process has terminated, unless it was replaced by a capture on other interfaces
         if output == '' and process.poll() is not None:
+            if capture[0] is not process and not shutdown_flag[0]:
+                continue
             break
 
         # Parse the output packet data
-        if output:
+        if output and not (pause_flag and pause_flag[0]):
             packetInfo = parse_line(output)
             if packetInfo:
                 src_ip, dest_ip, src_port, dest_port, size, arrival_time = packetInfo
+                try:
+                    pair = flows.pair_key(src_ip, dest_ip)
+                except ValueError:
+                    pair = None
 
+                if pair is None:
+                    pass  # Malformed address column, the packet is skipped
                 # Track traffic data for incoming/outgoing streams
-                if (src_ip, dest_ip) == incomingStream or (src_ip, dest_ip) == outgoingStream:
-                    key = (src_ip, dest_ip, src_port, dest_port)
-                    if (src_ip, dest_ip) == outgoingStream:
-                        sent_timestamps[key].append(arrival_time)
-                    if sent_timestamps[key]:
-                        sent_time = sent_timestamps[key].pop(0)
-                    current_size, count, arrival_times, last_arrival_time = temporary_dict[key]
-                    arrival_times.append(arrival_time)
-                    temporary_dict[key] = (current_size + size, count + 1, arrival_times, arrival_time)
+                elif pair == incoming_pair or pair == outgoing_pair:
+                    flow_id = flows.flow_id(pair, src_port, dest_port)
+                    flows.add_packet(flow_id, size, arrival_time)
+                    flow_media.add(flows.flow_key(flow_id), size, arrival_time)
+                    pair_media.add(pair, size, arrival_time)
+                    if packet_ring is not None:
+                        packet_ring.add(arrival_time, output)
                 else:
                     # Update stream sizes for IPv4 and IPv6 addresses
                     if src_ip in myIp:
-                        outStreamDict[(src_ip, dest_ip)] = outStreamDict.get((src_ip, dest_ip), 0) + size
+                        flows.out_pair_bytes[pair] = flows.out_pair_bytes.get(pair, 0) + size
+                        pair_media.add(pair, size, arrival_time)
                     elif dest_ip in myIp:
-                        inStreamDict[(src_ip, dest_ip)] = inStreamDict.get((src_ip, dest_ip), 0) + size
+                        flows.in_pair_bytes[pair] = flows.in_pair_bytes.get(pair, 0) + size
+                        pair_media.add(pair, size, arrival_time)
 
         # Periodically update and evaluate stream data every 'duration' seconds
         if time.time() - start_time >= duration:
-            with lock:
-                total_bytes_in = 0
-                total_bytes_out = 0
-
-                # Aggregate data for analysis
-                for (src_ip, dest_ip, src_port, dest_port), (total_size, count, arrival_times, _) in temporary_dict.items():
-                    if count > 0:
-                        data_dict[(src_ip, dest_ip, src_port, dest_port)] = (total_size, count, arrival_times)
-                    if incomingStream == (src_ip, dest_ip):
-                        total_bytes_in += total_size
-                    elif outgoingStream == (src_ip, dest_ip):
-                        total_bytes_out += total_size
-
-                # Stream replacement logic if the bitrate drops below 50 kbps
-                if total_bytes_in <= 50000 * duration / 8 and inStreamDict:
-                    incomingStream = max(inStreamDict, key=inStreamDict.get)
-                if total_bytes_out <= 50000 * duration / 8 and outStreamDict:
-                    outgoingStream = max(outStreamDict, key=outStreamDict.get)
-                else:
-                    notify[0] = True
-
-            inStreamDict.clear()
-            outStreamDict.clear()
-            temporary_dict.clear()
+            snapshot = {}
+            total_bytes_in = 0
+            total_bytes_out = 0
+
+            flow_labels = flow_media.classify_all()
+            pair_labels = pair_media.classify_all()
+
+            # Aggregate data for analysis into a snapshot owned by the scoring thread
+            for flow_id in range(len(flows)):
+                total_size = flows.total_size[flow_id]
+                count = flows.count[flow_id]
+                if count > 0:
+                    media_type = flow_labels.get(flows.flow_key(flow_id))
+                    snapshot[flows.flow_text(flow_id)] = (total_size, count, tuple(flows.arrival_times[flow_id]),
+                                                          media_type)
+                if flows.flow_pair(flow_id) == incoming_pair:
+                    total_bytes_in += total_size
+                elif flows.flow_pair(flow_id) == outgoing_pair:
+                    total_bytes_out += total_size
+
+            # Stream replacement logic if the bitrate drops below 50 kbps, preferring streams classified as video
+            if total_bytes_in <= 50000 * duration / 8 and flows.in_pair_bytes:
+                incomingStream = flows.pair_text(pick_stream(flows.in_pair_bytes, pair_labels))
+            if total_bytes_out <= 50000 * duration / 8 and flows.out_pair_bytes:
+                outgoingStream = flows.pair_text(pick_stream(flows.out_pair_bytes, pair_labels))
+            # Published even when a stream was replaced, so the scoring thread sees flows that went silent
+            if not (pause_flag and pause_flag[0]):
+                publish_latest(snapshot_queue, snapshot)
+
+            # Pair keys are re-derived because clear() may reset the interned addresses
+            if flows.clear():
+                pair_media.reset()
+                flow_media.reset()
+            pair_media.decay()
+            flow_media.decay()
+            incoming_pair = flows.pair_key(*incomingStream)
+            outgoing_pair = flows.pair_key(*outgoingStream)
             start_time = time.time()
 
         if shutdown_flag[0]:  # Check if shutdown is signaled
             print("Analysis shutdown")
             break
 
-def calculateNetworkParameters(data_dict, lock, notify, update_notify, qualities_list, shutdown_flag, all_quality_data):
+def calculateNetworkParameters(snapshot_queue, results_queue, qualities_list, shutdown_flag, all_quality_data,
+                               packet_ring=None, change_detector=None, exporter=None, control=None):
     """
     Analyzes stored packet data to compute network parameters like bitrate, latency, jitter, and quality. Updates
     results for UI or logging purposes, and appends calculated metrics for further monitoring or historical analysis.
+    Snapshots are consumed outside of any lock, so scoring never stalls the capture reader. Only flows classified as
+    a media type of BITRATE_SCALE are scored; non-media flows of the tracked pairs are skipped.
 
     Args:
-        data_dict (dict): Dictionary storing packet information for each conversation.
-        lock (threading.Lock): Lock for safely accessing shared data across threads.
-        notify (list): Flag to signal data updates for quality calculations.
-        update_notify (list): Flag to indicate updated network parameter results.
+        snapshot_queue (queue.Queue): Single-slot queue delivering interval snapshots from analyzeData.
+        results_queue (queue.Queue): Single-slot queue receiving the computed results for the UI.
         qualities_list (list): List storing quality scores for network performance over time.
         shutdown_flag (list): Shutdown signal flag list to terminate the function.
         all_quality_data (dict): Dictionary accumulating quality metrics data over time.
+        packet_ring (PacketRing): Optional buffer that dumps the packets around quality drops.
+        change_detector (ChangeDetector): Optional detector raising degradation and recovery alerts per flow.
+        exporter (ProbeExporter): Optional exporter pushing the interval summaries to a collector.
+        control (ControlServer): Optional control server publishing the results to its subscribers.
     """
     while not shutdown_flag[0]:
-        time.sleep(duration)
-        with lock:
-            if notify[0]:
-                conversationsDict = dict(data_dict)
-                notify[0] = False
-                results = {}
-
-                # Compute network parameters for each conversation
-                for key, (total_size, count, arrival_times) in conversationsDict.items():
-                    if count > 0:
-                        bitrate = (total_size * 8) / duration
-                        jitter = calculateJitter(arrival_times)
-                        latency = calculateLatency(arrival_times)
-                        quality = calculate_quality(bitrate, latency, jitter)
-
-                        qualities_list.append(quality)
-                        all_quality_data['bitrate'].append(bitrate)
-                        all_quality_data['jitter'].append(jitter)
-                        all_quality_data['latency'].append(latency)
-                        all_quality_data['quality'].append(quality)
-                        results[key] = (bitrate, jitter, latency, quality)
-
-                # Signal UI update with results
-                update_notify[0] = results
-                update_notify[1] = True
-
-                # Clear data for the next analysis period
-                data_dict.clear()
+        try:
+            conversationsDict = snapshot_queue.get(timeout=duration)
+        except queue.Empty:
+            continue
+        if conversationsDict is None:  # Woken up by a stop command
+            continue
+
+        results = {}
+        interval_end = time.time()
+
+        # Compute network parameters for each conversation
+        for key, (total_size, count, arrival_times, media_type) in conversationsDict.items():
+            if count > 0 and media_type in BITRATE_SCALE:
+                bitrate = (total_size * 8) / duration
+                jitter = calculateJitter(arrival_times)
+                latency = calculateLatency(arrival_times)
+                quality = calculate_quality(bitrate, latency, jitter, media_type)
+
+                qualities_list.append(quality)
+                all_quality_data['bitrate'].append(bitrate)
+                all_quality_data['jitter'].append(jitter)
+                all_quality_data['latency'].append(latency)
+                all_quality_data['quality'].append(quality)
+                results[key] = (bitrate, jitter, latency, quality)
+
+                if packet_ring is not None:
+                    packet_ring.check_quality(key, quality, media_type, count)
+                if change_detector is not None:
+                    change_detector.update(key, bitrate, jitter, latency, interval_end)
+                if exporter is not None:
+                    exporter.add(interval_end, key, count, total_size, bitrate, jitter, latency, quality)
+
+        if change_detector is not None:
+            change_detector.update_missing(conversationsDict, interval_end)
+            change_detector.expire(interval_end)
+
+        # Hand the results to the UI
+        publish_latest(results_queue, results)
+        if control is not None:
+            control.publish('results', [{'flow': list(key), 'bitrate': bitrate, 'jitter': jitter, 'latency': latency,
+                                         'quality': quality}
+                                        for key, (bitrate, jitter, latency, quality) in results.items()])
 
     print("calcnet shutdown")
@@ -0,0 +1,151 @@
+import ipaddress
+from array import array
+
+# Address indexes are packed into 20 bits of a pair key, ports into 16 bits each
+ADDRESS_BITS = 20
+MAX_ADDRESSES = 1 << ADDRESS_BITS
+
+
+class FlowTable:
+    """
+    Compact per-interval flow state. IP addresses are interned once into small integer indexes (with their packed
+    binary form kept for display), flows are identified by integer IDs, and the counters are stored as parallel
+    arrays instead of per-flow tuples keyed by strings.
+
+    Attributes:
+        total_size (array): Bytes seen per flow ID.
+        count (array): Packets seen per flow ID.
+        arrival_times (list): List of arrival times per flow ID.
+        out_pair_bytes (dict): Bytes per outgoing (src, dest) pair key for untracked traffic.
+        in_pair_bytes (dict): Bytes per incoming (src, dest) pair key for untracked traffic.
+    """
+    __slots__ = ('_address_ids', '_addresses', '_flow_ids', '_flow_keys', 'total_size', 'count', 'arrival_times',
+                 'out_pair_bytes', 'in_pair_bytes')
+
+    def __init__(self):
+        self._address_ids = {}
+        self._addresses = []
+        self._flow_ids = {}
+        self._flow_keys = []
+        self.total_size = array('Q')
+        self.count = array('L')
+        self.arrival_times = []
+        self.out_pair_bytes = {}
+        self.in_pair_bytes = {}
+
+    def __len__(self):
+        return len(self._flow_keys)
+
+    def address_id(self, ip):
+        """
+        Returns the interned index of an IP address given as text, assigning a new one on first sight.
+
+        Args:
+            ip (str): IPv4 or IPv6 address as printed by tshark.
+
+        Returns:
+            int: Index of the address in the table.
+
+        Raises:
+            ValueError: If the text is not a valid address. It is only parsed the first time it is seen, so
+                validating costs nothing for known addresses.
+        """
+        address_id = self._address_ids.get(ip)
+        if address_id is None:
+            address_id = len(self._addresses)
+            self._addresses.append(ipaddress.ip_address(ip).packed)
+            self._address_ids[ip] = address_id
+        return address_id
+
+    def address_text(self, address_id):
+        """Returns the text form of an interned address index."""
+        return str(ipaddress.ip_address(self._addresses[address_id]))
+
+    def pair_key(self, src_ip, dest_ip):
+        """
+        Returns a single integer identifying a (src_ip, dest_ip) pair.
+
+        Args:
+            src_ip (str): Source IP address.
+            dest_ip (str): Destination IP address.
+
+        Returns:
+            int: Pair key combining both address indexes.
+
+        Raises:
+            ValueError: If either address is not valid.
+        """
+        return (self.address_id(src_ip) << ADDRESS_BITS) | self.address_id(dest_ip)
+
+    def pair_text(self, pair_key):
+        """Returns the (src_ip, dest_ip) text tuple for a pair key."""
+        return self.address_text(pair_key >> ADDRESS_BITS), self.address_text(pair_key & (MAX_ADDRESSES - 1))
+
+    def flow_id(self, pair_key, src_port, dest_port):
+        """
+        Returns the integer flow ID for a pair key and ports, allocating counter slots for new flows.
+
+        Args:
+            pair_key (int): Key returned by pair_key().
+            src_port (int): Source port.
+            dest_port (int): Destination port.
+
+        Returns:
+            int: Flow ID indexing the counter arrays.
+        """
+        key = (pair_key << 32) | (src_port << 16) | dest_port
+        flow_id = self._flow_ids.get(key)
+        if flow_id is None:
+            flow_id = len(self._flow_keys)
+            self._flow_ids[key] = flow_id
+            self._flow_keys.append(key)
+            self.total_size.append(0)
+            self.count.append(0)
+            self.arrival_times.append([])
+        return flow_id
+
+    def add_packet(self, flow_id, size, arrival_time):
+        """Accounts one packet of the given size to a flow."""
+        self.total_size[flow_id] += size
+        self.count[flow_id] += 1
+        self.arrival_times[flow_id].append(arrival_time)
+
+    def flow_text(self, flow_id):
+        """
+        Returns the conversation key of a flow in the text form used by the rest of the application.
+
+        Returns:
+            tuple: (src_ip, dest_ip, src_port, dest_port) with IPs as text and ports as integers.
+        """
+        key = self._flow_keys[flow_id]
+        src_ip, dest_ip = self.pair_text(key >> 32)
+        return src_ip, dest_ip, (key >> 16) & 0xFFFF, key & 0xFFFF
+
+    def flow_key(self, flow_id):
+        """Returns the integer key of a flow, which stays the same across intervals while addresses are kept."""
+        return self._flow_keys[flow_id]
+
+    def flow_pair(self, flow_id):
+        """Returns the pair key a flow belongs to."""
+        return self._flow_keys[flow_id] >> 32
+
+    def clear(self):
+        """
+        Drops all flows and pair totals for the next interval. Interned addresses are kept so known hosts are not
+        parsed again, unless the address space of the pair keys is close to exhausted.
+
+        Returns:
+            bool: True if the interned addresses were reset as well, which invalidates pair and flow keys.
+        """
+        self._flow_ids.clear()
+        self._flow_keys.clear()
+        del self.total_size[:]
+        del self.count[:]
+        self.arrival_times.clear()
+        self.out_pair_bytes.clear()
+        self.in_pair_bytes.clear()
+        if len(self._addresses) >= MAX_ADDRESSES - 2:
+            self._address_ids.clear()
+            self._addresses.clear()
+            return True
+        return False
@@ -0,0 +1,116 @@
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict
+from flow_table import FlowTable
+from packet_capture import parse_line
+
+IPV4_LINE = "{frame} 1700000000.{frame:06d} 192.168.1.{host} → 52.112.{net}.7 UDP 1200 {port} → 3478 Len=1158\n"
+IPV6_LINE = ("{frame} 1700000000.{frame:06d} 2001:db8::{host:x} → 2603:1063:{net:x}::7 UDP 1200 {port} → 3478 "
+             "Len=1138\n")
+
+
+def flow_packets(flows):
+    """Returns one (src_ip, dest_ip, src_port, dest_port, size, arrival_time) packet per synthetic flow."""
+    return [(f"192.168.1.{index % 250}", f"52.112.{index // 250 % 250}.7", 50000 + index % 1000, 3478, 1200,
+             1700000000.0 + index) for index in range(flows)]
+
+
+def account_flow_table(flows, packets):
+    """Per-packet accounting of analyzeData with a FlowTable."""
+    for src_ip, dest_ip, src_port, dest_port, size, arrival_time in packets:
+        flows.add_packet(flows.flow_id(flows.pair_key(src_ip, dest_ip), src_port, dest_port), size, arrival_time)
+
+
+def account_legacy(state, packets):
+    """Per-packet accounting as analyzeData did before the FlowTable: string tuple keys in several dicts."""
+    temporary_dict, sent_timestamps = state
+    for src_ip, dest_ip, src_port, dest_port, size, arrival_time in packets:
+        key = (src_ip, dest_ip, src_port, dest_port)
+        sent_timestamps[key].append(arrival_time)
+        if sent_timestamps[key]:
+            sent_timestamps[key].pop(0)
+        current_size, count, arrival_times, _ = temporary_dict[key]
+        arrival_times.append(arrival_time)
+        temporary_dict[key] = (current_size + size, count + 1, arrival_times, arrival_time)
+
+
+def new_legacy_state():
+    return defaultdict(lambda: (0, 0, [], None)), defaultdict(list)
+
+
+def bytes_per_flow(make_state, account, flows):
+    """Measures the memory held per flow after one packet of each of `flows` flows."""
+    packets = flow_packets(flows)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state = make_state()
+    account(state, packets)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / flows
+
+
+def rate(function, count, repeat=3):
+    """Returns the best rate per second of `count` operations done by one call of function()."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def benchmark(flows=5000, packets=500000):
+    """
+    Prints the memory per flow, flow lookups per second and per-packet throughput of the FlowTable, next to the
+    string-keyed dicts it replaced.
+
+    Args:
+        flows (int): Distinct flows used for the memory figure.
+        packets (int): Packets per throughput run, spread over 64 flows like a call's tracked pairs.
+    """
+    print(f"Bytes per flow ({flows} flows, one packet each): "
+          f"FlowTable {bytes_per_flow(FlowTable, account_flow_table, flows):.0f}, "
+          f"string-keyed dicts {bytes_per_flow(new_legacy_state, account_legacy, flows):.0f}")
+
+    table = FlowTable()
+    hot = flow_packets(64)
+    account_flow_table(table, hot)
+    lookups = [hot[index % 64][:4] for index in range(packets)]
+
+    def lookup():
+        for src_ip, dest_ip, src_port, dest_port in lookups:
+            table.flow_id(table.pair_key(src_ip, dest_ip), src_port, dest_port)
+    print(f"Flow lookups (pair_key + flow_id on known flows): {rate(lookup, packets):,.0f}/s")
+
+    stream = [hot[index % 64] for index in range(packets)]
+    print(f"Accounting without parsing: FlowTable {rate(lambda: account_flow_table(FlowTable(), stream), packets):,.0f}"
+          f" pkt/s, string-keyed dicts {rate(lambda: account_legacy(new_legacy_state(), stream), packets):,.0f} pkt/s")
+
+    for name, template in (('IPv4', IPV4_LINE), ('IPv6', IPV6_LINE)):
+        lines = [template.format(frame=index, host=index % 8 + 1, net=index % 8 + 1, port=50000 + index % 8)
+                 for index in range(packets)]
+
+        def parse_and_account():
+            flows_table = FlowTable()
+            for line in lines:
+                src_ip, dest_ip, src_port, dest_port, size, arrival_time = parse_line(line)
+                flows_table.add_packet(flows_table.flow_id(flows_table.pair_key(src_ip, dest_ip), src_port,
+                                                           dest_port), size, arrival_time)
+
+        def parse_only():
+            for line in lines:
+                parse_line(line)
+        print(f"{name} lines: parse_line {rate(parse_only, packets):,.0f}/s, "
+              f"parse_line + FlowTable accounting {rate(parse_and_account, packets):,.0f} pkt/s")
+
+
+if __name__ == '__main__':
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Memory and throughput benchmark of the analyzer's flow table")
+    parser.add_argument("--flows", type=int, default=5000, help="Distinct flows used for the memory figure")
+    parser.add_argument("--packets", type=int, default=500000, help="Packets per throughput run")
+    args = parser.parse_args()
+
+    benchmark(args.flows, args.packets)
@@ -1,25 +1,23 @@
 import tkinter as tk
 import queue
 
-def createGUI(lock, update_notify, shutdown_flag, myIp):
+def createGUI(results_queue, shutdown_flag, myIp):
     """
     Creates and manages a Tkinter-based GUI for monitoring network quality parameters (bitrate, jitter, latency,
     quality) for active network connections. Displays dynamic connection details with real-time updates in a scrollable
     view. Highlights connections associated with the local host.
 
     Args:
-        lock (threading.Lock): Lock for safely accessing shared data across threads.
-        update_notify (list): List flag to signal GUI updates for displaying network data.
+        results_queue (queue.Queue): Queue delivering the latest scoring results for display.
         shutdown_flag (list): Flag list for indicating when to close the GUI.
-        myIp (list): List containing local IPv4 and IPv6 addresses, highlighted in the GUI.
+        myIp (LocalAddresses): Local IPv4 and IPv6 addresses, highlighted in the GUI.
 
     Variables:
-        data_queue (Queue): Queue for handling thread-safe data updates for GUI display.
         connection_labels (dict): Dictionary of labels for each network connection, storing all related metric labels.
         update_counter (list): Counter for managing periodic clearing of outdated connections from the GUI.
     """
-    # Initialize queue and main GUI window
-    data_queue = queue.Queue()
+    # Initialize main GUI window
+    data_queue = results_queue
     root = tk.Tk()
     root.title("Network Quality Monitor")
     root.geometry("1000x600")
@@ -129,15 +127,11 @@ def createGUI(lock, update_notify, shutdown_flag, myIp):
         root.after(1000, updateLabel)
 
     def process_data():
-        """Fetches data from shared variables, adds it to the queue for thread-safe updates, and checks for shutdown."""
-        with lock:
-            if shutdown_flag[0]:
-                print("GUI shutdown")
-                root.quit()
-                return
-            if update_notify[1]:
-                data_queue.put(update_notify[0])
-                update_notify[1] = False
+        """Checks for shutdown; results arrive through the queue and are drawn by updateLabel."""
+        if shutdown_flag[0]:
+            print("GUI shutdown")
+            root.quit()
+            return
 
         root.after(500, process_data)
 
@@ -0,0 +1,145 @@
+import ipaddress
+import socket
+from threading import Event, Thread
+import psutil
+
+refresh_interval = 5  # Seconds between interface address checks
+cache_limit = 4096  # Maximum number of memoized subnet lookups
+
+
+def _normalize(ip):
+    """Returns the canonical text of an address, dropping any IPv6 scope suffix, or None if it is not an IP."""
+    try:
+        return str(ipaddress.ip_address(ip.split('%', 1)[0]))
+    except ValueError:
+        return None
+
+
+def read_interface_addresses(interface):
+    """
+    Reads the addresses currently assigned to a network interface.
+
+    Args:
+        interface (str): Interface name as listed by psutil (e.g., "eth0" or "Wi-Fi").
+
+    Returns:
+        frozenset: Address strings, empty if the interface is unknown.
+    """
+    addresses = set()
+    for entry in psutil.net_if_addrs().get(interface, []):
+        if entry.family not in (socket.AF_INET, socket.AF_INET6):
+            continue
+        address = _normalize(entry.address)
+        if address is not None:
+            addresses.add(address)
+    return frozenset(addresses)
+
+
+def read_hostname_addresses():
+    """
+    Resolves the addresses of the local hostname, used when the interface cannot be inspected.
+
+    Returns:
+        frozenset: IPv4 and IPv6 address strings.
+    """
+    addresses = set()
+    try:
+        for entry in socket.getaddrinfo(socket.gethostname(), None):
+            address = _normalize(entry[4][0])
+            if address is not None:
+                addresses.add(address)
+    except Exception as e:
+        print(f"Error finding IP addresses: {e}")
+    return frozenset(addresses)
+
+
+class LocalAddresses:
+    """
+    Classifies IP addresses as local to the capture interfaces. Exact addresses are answered from a set, optional
+    subnets (e.g., a VPN pool) are checked once per address and memoized. A background thread re-reads the interfaces
+    so the classification follows VPN or Wi-Fi changes during a call.
+
+    Supports `ip in local_addresses`, so it can be used wherever the tuple of local IPs was used before.
+    """
+
+    def __init__(self, interfaces, subnets=()):
+        """
+        Args:
+            interfaces (list): Interfaces the capture runs on.
+            subnets (iterable): Extra networks (strings or ipaddress networks) to treat as local.
+        """
+        self.interfaces = tuple(interfaces)
+        self.subnets = tuple(ipaddress.ip_network(subnet, strict=False) for subnet in subnets)
+        self._stop_event = Event()
+        self._thread = None
+        self._addresses = frozenset()
+        self._cache = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-reads the interface addresses and swaps in the new lookup state if anything changed.
+
+        Returns:
+            bool: True if the local addresses changed.
+        """
+        addresses = frozenset()
+        for interface in self.interfaces:
+            addresses |= read_interface_addresses(interface)
+        if not addresses:
+            addresses = read_hostname_addresses()
+        if addresses == self._addresses:
+            return False
+        # Readers only ever see a complete state: the set is replaced by a single assignment
+        self._addresses = addresses
+        return True
+
+    def __contains__(self, ip):
+        if ip in self._addresses:
+            return True
+        if not self.subnets:
+            return False
+        cache = self._cache
+        local = cache.get(ip)
+        if local is None:
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                return False
+            local = any(address in subnet for subnet in self.subnets)
+            if len(cache) >= cache_limit:
+                cache.clear()
+            cache[ip] = local
+        return local
+
+    def __iter__(self):
+        return iter(self._addresses)
+
+    def __repr__(self):
+        return f"LocalAddresses({list(self.interfaces)!r}, {sorted(self._addresses)})"
+
+    def set_interfaces(self, interfaces):
+        """Switches to another set of interfaces and re-reads their addresses."""
+        self.interfaces = tuple(interfaces)
+        self.refresh()
+
+    def start(self):
+        """Starts the background thread that refreshes the addresses every refresh_interval seconds."""
+        if self._thread is None:
+            self._thread = Thread(target=self._watch, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background refresh thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop_event.wait(refresh_interval):
+            try:
+                if self.refresh():
+                    print(f"Local addresses changed: {sorted(self._addresses)}")
+            except Exception as e:
+                print(f"Error refreshing local addresses: {e}")
@@ -2,106 +2,162 @@ import argparse
 import socket
 from threading import Lock, Thread
 from queue import Queue
-from packet_capture import startTshark, find_largest_streams
-from data_analysis import analyzeData, calculateNetworkParameters
+from packet_capture import startCapture, find_largest_streams
+from data_analysis import analyzeData, calculateNetworkParameters, publish_latest
 from gui import createGUI
 from plotting import plot_data
-import select
+from local_addresses import LocalAddresses
+from packet_ring import PacketRing
+from change_detection import ChangeDetector, print_sink, LogFileSink, SocketSink, WebhookSink
+from probe_exporter import ProbeExporter
+from control_server import ControlServer
 import time
 
 duration = 2  # Duration for analyzing metrics in seconds
 
-def findMyIp():
-    ip_addresses = []
-
-    try:
-        # Get all addresses using getaddrinfo
-        hostname = socket.gethostname()
-        addr_info = socket.getaddrinfo(hostname, None)
-
-        for entry in addr_info:
-            address = entry[4][0]  # Extract the IP address part
-            ip_addresses.append(address)  # Add both IPv4 and IPv6 to the same list
-
-    except Exception as e:
-        print(f"Error finding IP addresses: {e}")
-
-    # Return a tuple with the list of IPs
-    return tuple(ip_addresses)
-
-
-def shutdown_listener(shutdown_flag):
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind(('localhost', 9999))
-    server_socket.listen(1)
-    print("Listening for shutdown command on port 9999...")
-
-    while not shutdown_flag[0]:
-        readable, _, _ = select.select([server_socket], [], [], 1)
-
-        if readable:
-            conn, addr = server_socket.accept()
-            with conn:
-                print(f"Connection established with {addr}")
-                data = conn.recv(1024).decode('utf-8')
-                if data == "Stop":
-                    print("Shutdown signal received: Call ended")
-                    shutdown_flag[0] = True
-                    break
-
-        if shutdown_flag[0]:
-            print("Shutdown flag set, closing socket.")
-            break
-
-    server_socket.close()
-    print("Listener socket closed.")
-
-
-def main(interface):
-    lock = Lock()
-    notify = [False]
-    update_notify = [None, False]
+def main(interfaces, local_subnets=(), alert_sinks=(), exporter=None, control=None):
+    """
+    Captures and scores the call on the given interfaces until a stop command arrives or the capture ends.
+
+    The GUI and the plots create their Tk interpreters on worker threads. A caller that runs main() in-process must
+    not keep a Tk interpreter of its own alive, and must release it on the thread that created it before calling
+    (see Crouler.py).
+
+    Args:
+        interfaces (list): Interfaces to capture on.
+        local_subnets (iterable): Extra subnets treated as local.
+        alert_sinks (iterable): Additional change detector sinks.
+        exporter (ProbeExporter): Optional exporter pushing the interval summaries to a collector.
+        control (ControlServer): Control server of the caller; main() runs its own when None.
+    """
+    snapshot_queue = Queue(maxsize=1)  # Interval aggregates handed from analysis to scoring
+    results_queue = Queue(maxsize=1)  # Latest scoring results handed to the GUI
     shutdown_flag = [False]
-    data_dict = {}
+    pause_flag = [False]
     qualities_list = []
     all_quality_data = {'bitrate': [], 'jitter': [], 'latency': [], 'quality': []}
 
-    myIp = findMyIp()
+    # Reuse the control server of the caller (Crouler) or run our own
+    own_control = control is None
+    if own_control:
+        control = ControlServer()
+        control.start()
+
+    myIp = LocalAddresses(interfaces, local_subnets)
+    myIp.start()
     print(myIp)
-    process = startTshark(interface)
-    outgoingStream, incomingStream = find_largest_streams(process, True, True, myIp)
+    capture = [startCapture(interfaces)]  # Replaced when the interfaces are switched
+
+    def stop(message):
+        print("Shutdown signal received: Call ended")
+        shutdown_flag[0] = True
+        capture[0].terminate()  # Unblocks the reader immediately
+        publish_latest(snapshot_queue, None)  # Wakes the scoring thread
+
+    def pause(message):
+        pause_flag[0] = True
+
+    def resume(message):
+        pause_flag[0] = False
+
+    switch_lock = Lock()
+
+    def switch_capture(new_interfaces):
+        # Starting tshark and reading the interface addresses can take a while, so this runs on its own thread
+        with switch_lock:
+            if shutdown_flag[0]:
+                return
+            try:
+                previous, capture[0] = capture[0], startCapture(new_interfaces)
+                previous.terminate()
+                myIp.set_interfaces(new_interfaces)
+            except Exception as e:
+                print(f"Error switching capture to {new_interfaces}: {e}")
+                control.publish('interfaces', {'interfaces': list(myIp.interfaces), 'error': str(e)})
+                return
+        print(f"Capture switched to {new_interfaces}")
+        control.publish('interfaces', {'interfaces': list(new_interfaces)})
+
+    def switch_interface(message):
+        new_interfaces = message.get('interfaces')
+        if not new_interfaces or not isinstance(new_interfaces, list):
+            raise ValueError("interfaces must be a non-empty list")
+        # Reply right away; the outcome is published on the 'interfaces' topic once the new capture runs
+        Thread(target=switch_capture, args=(new_interfaces,), daemon=True).start()
+        return {'switching': new_interfaces}
+
+    def stats(message):
+        return {'interfaces': list(myIp.interfaces), 'paused': pause_flag[0], 'results': control.last('results')}
+
+    for command, handler in (('stop', stop), ('pause', pause), ('resume', resume),
+                             ('switch_interface', switch_interface), ('stats', stats)):
+        control.register(command, handler)
+    if own_control:
+        control.register('start', resume)  # The capture already runs; Crouler keeps its own handler for the call start
+
+    outgoingStream, incomingStream = find_largest_streams(capture[0], True, True, myIp)
 
     if outgoingStream and incomingStream:
-        analyze_thread = Thread(target=analyzeData, args=(process, outgoingStream, incomingStream, data_dict, lock, notify, shutdown_flag, myIp))
-        calc_thread = Thread(target=calculateNetworkParameters, args=(data_dict, lock, notify, update_notify, qualities_list, shutdown_flag, all_quality_data))
+        packet_ring = PacketRing()  # Keeps recent packets to save the ones around quality drops
+        change_detector = ChangeDetector([print_sink, packet_ring, *alert_sinks,
+                                          lambda event: control.publish('alerts', event)])
+        analyze_thread = Thread(target=analyzeData, args=(capture, outgoingStream, incomingStream, snapshot_queue, shutdown_flag, myIp, packet_ring, pause_flag))
+        calc_thread = Thread(target=calculateNetworkParameters, args=(snapshot_queue, results_queue, qualities_list, shutdown_flag, all_quality_data, packet_ring, change_detector, exporter, control))
 
         analyze_thread.start()
         calc_thread.start()
 
-        gui_thread = Thread(target=createGUI, args=(lock, update_notify, shutdown_flag, myIp))
+        gui_thread = Thread(target=createGUI, args=(results_queue, shutdown_flag, myIp))
         gui_thread.start()
 
-        listener_thread = Thread(target=shutdown_listener, args=(shutdown_flag,))
-        listener_thread.start()
-
-        listener_thread.join()
         analyze_thread.join()
         calc_thread.join()
         gui_thread.join()
+        packet_ring.stop()
 
         if shutdown_flag[0]:
             plot_thread = Thread(target=plot_data, args=(all_quality_data,))
             plot_thread.start()
             plot_thread.join()
 
+    with switch_lock:  # A switch in progress must not leave its capture running
+        capture[0].terminate()
+    myIp.stop()
+    if exporter is not None:
+        exporter.stop()
+    if own_control:
+        control.close()
     print("Program finished")
 
 
 if __name__ == '__main__':
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Network Quality Analysis for Microsoft Teams")
-    parser.add_argument("interface", help="Network interface to use for packet capture")
+    parser.add_argument("interfaces", nargs="+",
+                        help="Network interfaces to use for packet capture; several are captured in parallel")
+    parser.add_argument("--local-subnet", action="append", default=[],
+                        help="Additional subnet to treat as local, e.g. a VPN address pool (repeatable)")
+    parser.add_argument("--alert-log", help="File receiving quality alerts as JSON lines")
+    parser.add_argument("--alert-udp", help="host:port receiving quality alerts as JSON datagrams")
+    parser.add_argument("--alert-webhook", help="URL receiving quality alerts as JSON POST requests")
+    parser.add_argument("--collector", help="host:port of a collector receiving the interval summaries")
+    parser.add_argument("--probe-id", default=socket.gethostname(), help="Name of this probe at the collector")
+    parser.add_argument("--call-id", help="Identifier shared by all probes measuring the same call")
     args = parser.parse_args()
 
-    # Run the main function with the specified interface
-    main(args.interface)
+    alert_sinks = []
+    if args.alert_log:
+        alert_sinks.append(LogFileSink(args.alert_log))
+    if args.alert_udp:
+        host, port = args.alert_udp.rsplit(':', 1)
+        alert_sinks.append(SocketSink(host, int(port)))
+    if args.alert_webhook:
+        alert_sinks.append(WebhookSink(args.alert_webhook))
+
+    exporter = None
+    if args.collector:
+        host, port = args.collector.rsplit(':', 1)
+        exporter = ProbeExporter(host, int(port), args.probe_id, args.call_id or f"{args.probe_id}-{int(time.time())}")
+
+    # Run the main function with the specified interfaces
+    main(args.interfaces, args.local_subnet, alert_sinks, exporter)
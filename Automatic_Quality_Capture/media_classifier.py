@@ -0,0 +1,158 @@
+from bisect import bisect_right
+import numpy as np
+
+AUDIO = 'audio'
+VIDEO = 'video'
+SCREEN_SHARE = 'screen share'
+NON_MEDIA = 'non-media'
+LABELS = np.array([NON_MEDIA, AUDIO, VIDEO, SCREEN_SHARE])
+
+# Upper edges of the histogram bins; the last bin holds everything above the last edge
+SIZE_EDGES = [100, 200, 300, 500, 800, 1000, 1200]  # Packet size in bytes
+IAT_EDGES = [0.001, 0.005, 0.010, 0.015, 0.025, 0.040, 0.100, 0.250]  # Inter-arrival time in seconds
+
+min_packets = 30  # Flows with fewer (decayed) packets are not considered media
+
+
+class MediaClassifier:
+    """
+    Labels flows as audio, video, screen share or non-media from packet-size and inter-arrival histograms. Each flow
+    owns one row of two fixed-bin NumPy count matrices, so adding a packet costs two bin lookups and two increments,
+    and all flows are classified together with vectorized operations.
+
+    Typical shapes of the traffic:
+        audio: small packets (< 300 bytes) at a regular 10-40 ms packetization interval.
+        video: packets of 500 bytes or more at frame gaps of 25-250 ms, sent in back-to-back bursts (one per frame)
+            or, at low resolutions, one packet per frame.
+        screen share: large bursts separated by long idle periods, sent only when the screen changes.
+        non-media: everything else, e.g. downloads with almost no gaps between large packets.
+    """
+
+    def __init__(self, capacity=64, sticky=False):
+        """
+        Args:
+            capacity (int): Initial number of flow rows; grown as needed.
+            sticky (bool): Keep the last media label of a flow while it looks like non-media, e.g. video whose
+                resolution and packet rate dropped, as long as the flow is not forgotten by decay().
+        """
+        self.sticky = sticky
+        self._rows = {}
+        self._keys = []
+        self.sizes = np.zeros((capacity, len(SIZE_EDGES) + 1), dtype=np.float64)
+        self.gaps = np.zeros((capacity, len(IAT_EDGES) + 1), dtype=np.float64)
+        self.last_arrival = np.zeros(capacity, dtype=np.float64)
+        self.media = np.zeros(capacity, dtype=np.int8)  # Last media label index per flow, 0 (NON_MEDIA) if none
+
+    def _row(self, key):
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            if row == len(self.last_arrival):
+                self.sizes = np.vstack((self.sizes, np.zeros_like(self.sizes)))
+                self.gaps = np.vstack((self.gaps, np.zeros_like(self.gaps)))
+                self.last_arrival = np.concatenate((self.last_arrival, np.zeros_like(self.last_arrival)))
+                self.media = np.concatenate((self.media, np.zeros_like(self.media)))
+            self._rows[key] = row
+            self._keys.append(key)
+        return row
+
+    def add(self, key, size, arrival_time):
+        """
+        Accounts one packet of a flow.
+
+        Args:
+            key: Hashable flow identifier.
+            size (int): Packet size in bytes.
+            arrival_time (float): Capture timestamp in seconds.
+        """
+        row = self._row(key)
+        self.sizes[row, bisect_right(SIZE_EDGES, size)] += 1
+        last_arrival = self.last_arrival[row]
+        if last_arrival:
+            self.gaps[row, bisect_right(IAT_EDGES, arrival_time - last_arrival)] += 1
+        self.last_arrival[row] = arrival_time
+
+    def classify_all(self):
+        """
+        Classifies every known flow.
+
+        Returns:
+            dict: Label per flow key.
+        """
+        count = len(self._keys)
+        if not count:
+            return {}
+        sizes = self.sizes[:count]
+        gaps = self.gaps[:count]
+        packets = sizes.sum(axis=1)
+        size_share = sizes / np.maximum(packets, 1)[:, None]
+        gap_share = gaps / np.maximum(gaps.sum(axis=1), 1)[:, None]
+
+        small = size_share[:, :3].sum(axis=1)  # < 300 bytes
+        sizable = size_share[:, 4:].sum(axis=1)  # >= 500 bytes
+        large = size_share[:, 6:].sum(axis=1)  # >= 1000 bytes
+        burst = gap_share[:, 0]  # < 1 ms
+        packetization = gap_share[:, 3:6].sum(axis=1)  # 10-40 ms
+        frame_gap = gap_share[:, 5:8].sum(axis=1)  # 25-250 ms
+        idle = gap_share[:, 8]  # > 250 ms
+
+        labels = np.zeros(count, dtype=np.int8)  # NON_MEDIA
+        media = packets >= min_packets
+        framed = ((burst >= 0.2) & (frame_gap >= 0.05)) | (frame_gap >= 0.5)  # Bursts per frame or one packet each
+        labels[media & (sizable >= 0.3) & framed & (burst < 0.9)] = 2  # VIDEO
+        labels[media & (large >= 0.3) & (idle >= 0.02) & (burst >= 0.2)] = 3  # SCREEN_SHARE
+        labels[media & (small >= 0.8) & (packetization >= 0.5)] = 1  # AUDIO
+        if self.sticky:
+            labels = np.where(labels == 0, self.media[:count], labels)
+            self.media[:count] = labels
+        return dict(zip(self._keys, LABELS[labels].tolist()))
+
+    def decay(self, factor=0.5):
+        """
+        Ages the histograms so the labels follow the recent behaviour of each flow, and forgets flows that have
+        become silent. Called once per analysis interval.
+        """
+        count = len(self._keys)
+        self.sizes[:count] *= factor
+        self.gaps[:count] *= factor
+        keep = np.flatnonzero(self.sizes[:count].sum(axis=1) >= 1)
+        if len(keep) < count:
+            self.sizes[:len(keep)] = self.sizes[keep]
+            self.gaps[:len(keep)] = self.gaps[keep]
+            self.last_arrival[:len(keep)] = self.last_arrival[keep]
+            self.media[:len(keep)] = self.media[keep]
+            self.sizes[len(keep):count] = 0
+            self.gaps[len(keep):count] = 0
+            self.last_arrival[len(keep):count] = 0
+            self.media[len(keep):count] = 0
+            self._keys = [self._keys[row] for row in keep]
+            self._rows = {key: row for row, key in enumerate(self._keys)}
+
+    def reset(self):
+        """Forgets all flows."""
+        count = len(self._keys)
+        self.sizes[:count] = 0
+        self.gaps[:count] = 0
+        self.last_arrival[:count] = 0
+        self.media[:count] = 0
+        self._keys = []
+        self._rows = {}
+
+
+def pick_stream(volumes, labels):
+    """
+    Picks the stream to follow: the largest video stream if there is one, otherwise the largest media stream,
+    otherwise the largest stream.
+
+    Args:
+        volumes (dict): Packet or byte counts per stream key.
+        labels (dict): Media label per stream key.
+
+    Returns:
+        The chosen key, or None if volumes is empty.
+    """
+    for wanted in ((VIDEO,), (VIDEO, SCREEN_SHARE, AUDIO), None):
+        candidates = [key for key in volumes if wanted is None or labels.get(key) in wanted]
+        if candidates:
+            return max(candidates, key=volumes.get)
+    return None
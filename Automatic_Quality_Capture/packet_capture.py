@@ -1,6 +1,52 @@
 import subprocess
-from collections import defaultdict
+import heapq
+import time
+from collections import defaultdict, deque
+from queue import Queue, Empty
+from threading import Thread
 import re
+from media_classifier import MediaClassifier, pick_stream
+
+reorder_delay = 0.2  # Maximum seconds a packet is held back to restore timestamp order across interfaces
+dedup_window = 0.005  # Seconds within which packets on two interfaces are compared for duplication
+encapsulation_overhead = (16, 200)  # Bytes a tunnel adds around a packet (IP-in-IP up to IPsec/OpenVPN with link headers)
+encapsulation_spread = 16  # Bytes the overhead of one inner flow may vary by (cipher block padding)
+encapsulation_delay = 0.001  # Seconds the delay between an inner packet and its carrier copy may vary by
+encapsulation_min_packets = 20  # Packets of an outer flow per evaluation of whether it is a tunnel carrier
+encapsulation_ratio = 0.8  # Share of an outer flow's packets that must consistently wrap a tunnel packet
+
+
+class _CarrierStats:
+    """Evidence that one flow encapsulates flows of another interface, counted over the current evaluation."""
+    __slots__ = ('packets', 'wrapped', 'pairings')
+
+    def __init__(self):
+        self.packets = 0
+        self.wrapped = 0
+        # Per inner (interface index, flow): [lowest, highest] size difference and [lowest, highest] delay
+        self.pairings = {}
+
+    def consistent(self, inner, overhead, delay):
+        """Returns True if a pairing with `inner` fits the size differences and delays of its earlier pairings."""
+        bounds = self.pairings.get(inner)
+        return bounds is None or (max(bounds[1], overhead) - min(bounds[0], overhead) <= encapsulation_spread and
+                                  max(bounds[3], delay) - min(bounds[2], delay) <= encapsulation_delay)
+
+    def match(self, inner, overhead, delay):
+        """
+        Records a packet of this flow paired with a packet of `inner`.
+
+        Returns:
+            bool: True if the pairing is consistent with the earlier pairings of the same inner flow.
+        """
+        bounds = self.pairings.get(inner)
+        if bounds is None:
+            self.pairings[inner] = [overhead, overhead, delay, delay]
+            return True
+        if not self.consistent(inner, overhead, delay):
+            return False
+        bounds[:] = min(bounds[0], overhead), max(bounds[1], overhead), min(bounds[2], delay), max(bounds[3], delay)
+        return True
 
 def startTshark(interface):
     """
@@ -12,13 +58,208 @@ def startTshark(interface):
     Returns:
         Popen: A subprocess Popen object capturing tshark output in real-time.
     """
-    command = ['tshark', '-i', interface, '-f', 'udp or tcp']
+    command = ['tshark', '-i', interface, '-t', 'e', '-f', 'udp or tcp']  # Epoch times keep interfaces comparable
     process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8',
                                errors='ignore')
     print("Capturing packets...")
     return process
 
 
+class MergedCapture:
+    """
+    Merges the output of several tshark processes into one timestamp-ordered stream of lines. Each process is read by
+    its own thread; lines are merged with a heap and released once every live reader has reached their timestamp, or
+    after reorder_delay seconds at most.
+
+    Two kinds of redundancy between interfaces are removed:
+        duplicates: the same flow and packet size seen on two interfaces within dedup_window (e.g., a bridge and its
+            member) are emitted once.
+        encapsulation: a flow on one interface whose packets almost always pair with a packet of the same inner
+            flow on another interface within dedup_window, larger by a stable overhead (varying by at most
+            encapsulation_spread bytes per inner flow) and after a stable delay (varying by at most
+            encapsulation_delay), is the tunnel carrying them (e.g., the VPN's UDP flow on
+            Wi-Fi carrying the call on the VPN interface). While recognised, its packets are dropped so the media is
+            not counted twice and the carrier is never picked as the stream. The decision is re-evaluated every
+            encapsulation_min_packets packets of the flow, so it expires once the flow stops pairing.
+
+    Exposes `stdout.readline()` and `poll()` like a single Popen object, so it can be used in its place.
+    """
+
+    def __init__(self, processes):
+        """
+        Args:
+            processes (list): tshark Popen objects, one per interface.
+        """
+        self.processes = processes
+        self.stdout = self
+        self._queue = Queue()
+        self._heap = []
+        self._sequence = 0
+        self._latest = [None] * len(processes)
+        self._finished = [False] * len(processes)
+        self._window = deque()  # [timestamp, interface index, flow, size, matched] of recently emitted packets
+        self._carrier_stats = defaultdict(_CarrierStats)  # Per (interface index, flow)
+        self._carriers = set()  # (interface index, flow) recognised as encapsulating another interface's traffic
+        for index, process in enumerate(processes):
+            Thread(target=self._read, args=(index, process), daemon=True).start()
+
+    def _read(self, index, process):
+        """Reads one tshark process, forwarding (timestamp, packet info, line) entries to the merge queue."""
+        for line in process.stdout:
+            packetInfo = parse_line(line)
+            if packetInfo:
+                self._queue.put((index, packetInfo[5], packetInfo, line))
+        self._queue.put((index, None, None, None))
+
+    def _receive(self, entry):
+        index, timestamp, packetInfo, line = entry
+        if timestamp is None:
+            self._finished[index] = True
+            return
+        self._latest[index] = timestamp
+        heapq.heappush(self._heap, (timestamp, self._sequence, index, packetInfo, line, time.monotonic()))
+        self._sequence += 1
+
+    def _watermark(self):
+        """Returns the timestamp up to which every live reader has delivered, or None if one has not started."""
+        live = [latest for latest, finished in zip(self._latest, self._finished) if not finished]
+        if not live:
+            return float('inf')
+        if None in live:
+            return None
+        return min(live)
+
+    def _is_redundant(self, packetInfo, timestamp, index):
+        """
+        Compares a packet with the packets emitted from other interfaces within dedup_window.
+
+        Returns:
+            bool: True if the packet duplicates one already emitted or belongs to a recognised tunnel carrier.
+        """
+        flow, size = packetInfo[:4], packetInfo[4]
+        source = (index, flow)
+        window = self._window
+        while window and window[0][0] < timestamp - dedup_window:
+            window.popleft()
+
+        if len(self._carrier_stats) > 65536:
+            self._carrier_stats.clear()  # Forget the evidence of idle flows so memory stays bounded
+        stats = self._carrier_stats[source]
+        stats.packets += 1
+
+        # Pair the packet with an earlier one of another interface: an exact copy, or one that one of the two wraps.
+        # A pairing consistent with the inner flow's earlier overheads is preferred over the most recent candidate.
+        low, high = encapsulation_overhead
+        candidate = None
+        for entry in reversed(window):
+            seen_index, seen_flow, seen_size = entry[1], entry[2], entry[3]
+            if entry[4] or seen_index == index:
+                continue
+            if seen_flow == flow and seen_size == size:
+                entry[4] = True
+                return True
+            if seen_flow == flow:
+                continue
+            delay = timestamp - entry[0]
+            if low <= size - seen_size <= high:
+                carrier, inner, overhead = stats, (seen_index, seen_flow), size - seen_size
+            elif low <= seen_size - size <= high:
+                carrier, inner, overhead, delay = (self._carrier_stats[(seen_index, seen_flow)], source,
+                                                   seen_size - size, -delay)
+            else:
+                continue
+            if inner in carrier.pairings and carrier.consistent(inner, overhead, delay):
+                candidate = (entry, carrier, inner, overhead, delay)
+                break
+            if candidate is None:
+                candidate = (entry, carrier, inner, overhead, delay)
+
+        matched = candidate is not None
+        if matched:
+            entry, carrier, inner, overhead, delay = candidate
+            entry[4] = True
+            if carrier.match(inner, overhead, delay):
+                carrier.wrapped += 1
+        window.append([timestamp, index, flow, size, matched])
+
+        if stats.packets >= encapsulation_min_packets:
+            self._evaluate(source, stats)
+        return source in self._carriers
+
+    def _evaluate(self, source, stats):
+        """Decides whether a flow is a tunnel carrier from its last encapsulation_min_packets packets."""
+        carrier = stats.wrapped >= encapsulation_ratio * stats.packets
+        if carrier and source not in self._carriers:
+            self._carriers.add(source)
+            print(f"Ignoring tunnel carrier {source[1]} on capture {source[0]}")
+        elif not carrier and source in self._carriers:
+            self._carriers.discard(source)
+            print(f"Flow {source[1]} on capture {source[0]} no longer carries a tunnel")
+        stats.packets = stats.wrapped = 0
+
+    def readline(self):
+        """
+        Returns the next line in timestamp order, or an empty string if none is ready within reorder_delay.
+        """
+        deadline = time.monotonic() + reorder_delay
+        while True:
+            try:
+                while True:
+                    self._receive(self._queue.get_nowait())
+            except Empty:
+                pass
+
+            watermark = self._watermark()
+            while self._heap:
+                timestamp, _, index, packetInfo, line, received = self._heap[0]
+                if not ((watermark is not None and timestamp <= watermark) or
+                        time.monotonic() - received >= reorder_delay):
+                    break
+                heapq.heappop(self._heap)
+                if not self._is_redundant(packetInfo, timestamp, index):
+                    return line
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (all(self._finished) and not self._heap):
+                return ''
+            if self._heap:
+                # Wake up when the oldest held packet is due, even if no reader delivers anything
+                remaining = min(remaining, max(0, self._heap[0][5] + reorder_delay - time.monotonic()))
+            try:
+                self._receive(self._queue.get(timeout=remaining))
+            except Empty:
+                pass
+
+    def poll(self):
+        """Returns None while any process is running or lines are pending, otherwise the first non-zero exit code."""
+        if not all(self._finished) or self._heap or not self._queue.empty():
+            return None
+        codes = [process.poll() for process in self.processes]
+        if None in codes:
+            return None
+        return next((code for code in codes if code), 0)
+
+    def terminate(self):
+        """Terminates every tshark process."""
+        for process in self.processes:
+            process.terminate()
+
+
+def startCapture(interfaces):
+    """
+    Starts packet capture on one or more interfaces.
+
+    Args:
+        interfaces (list): Network interfaces to capture packets on.
+
+    Returns:
+        Popen or MergedCapture: A single tshark process, or a merged capture when several interfaces are given.
+    """
+    if len(interfaces) == 1:
+        return startTshark(interfaces[0])
+    return MergedCapture([startTshark(interface) for interface in interfaces])
+
+
 def parse_line(output):
     """
     Parses a line of tshark output to extract relevant packet information, including source/destination IPs and ports.
@@ -41,7 +282,8 @@ def parse_line(output):
 
     if len(parts) >= 10:
         try:
-            arrival_time = float(parts[0])
+            # parts[0] is the frame number, which restarts per capture; parts[1] is the epoch timestamp
+            arrival_time = float(parts[1])
 
             # Match source and destination IPs (could be either IPv4 or IPv6)
             src_ip_match = re.match(ipv6_regex, parts[2]) or re.match(ipv4_regex, parts[2])
@@ -50,12 +292,14 @@ def parse_line(output):
             if not src_ip_match or not dest_ip_match:
                 return None
 
-            src_ip = src_ip_match.group(0)
-            dest_ip = dest_ip_match.group(0)
+            # The whole column is the address; the regex would cut addresses ending in "::". Addresses are validated
+            # once per new address by FlowTable.address_id, not here on every packet
+            src_ip = parts[2]
+            dest_ip = parts[4]
 
             # Extract source and destination ports
-            src_port = parts[7]
-            dest_port = parts[9]
+            src_port = int(parts[7])
+            dest_port = int(parts[9])
 
             # Extract total packet size
             total_size = int(parts[6])
@@ -68,19 +312,21 @@ def parse_line(output):
 
 def find_largest_streams(process, findOutgoing, findIncoming, myIp):
     """
-    Identifies the largest outgoing and incoming data streams based on packet counts for a specified IP.
+    Identifies the largest outgoing and incoming data streams based on packet counts for a specified IP, preferring
+    streams whose packet sizes and timing look like video.
 
     Args:
         process (Popen): The tshark subprocess object for reading captured packet data.
         findOutgoing (bool): Flag to find the largest outgoing stream.
         findIncoming (bool): Flag to find the largest incoming stream.
-        myIp (list): List containing local IP addresses.
+        myIp (LocalAddresses): Local addresses of the capture interface.
 
     Returns:
         tuple: The largest outgoing and incoming streams as tuples of (src_ip, dest_ip).
     """
     incomingDict = defaultdict(int)
     outgoingDict = defaultdict(int)
+    media = MediaClassifier()
     count = 0
 
     # Read 2000 packets or until the process ends
@@ -91,23 +337,24 @@ def find_largest_streams(process, findOutgoing, findIncoming, myIp):
         if output:
             packetInfo = parse_line(output)
             if packetInfo:
-                src_ip, dest_ip, _, _, _, _ = packetInfo
+                src_ip, dest_ip, _, _, size, arrival_time = packetInfo
                 if src_ip in myIp:
                     outgoingDict[(src_ip, dest_ip)] += 1
+                    media.add((src_ip, dest_ip), size, arrival_time)
                     count += 1
 
                 elif dest_ip in myIp:
                     incomingDict[(src_ip, dest_ip)] += 1
+                    media.add((src_ip, dest_ip), size, arrival_time)
                     count += 1
 
 
     # Determine the largest streams based on packet counts
+    labels = media.classify_all()
     if findIncoming and findOutgoing:
-        max_incoming = max(incomingDict, key=incomingDict.get) if incomingDict else None
-        max_outgoing = max(outgoingDict, key=outgoingDict.get) if outgoingDict else None
-        return max_outgoing, max_incoming
+        return pick_stream(outgoingDict, labels), pick_stream(incomingDict, labels)
     elif findIncoming:
-        return max(incomingDict, key=incomingDict.get) if incomingDict else None
+        return pick_stream(incomingDict, labels)
     elif findOutgoing:
-        return max(outgoingDict, key=outgoingDict.get) if outgoingDict else None
+        return pick_stream(outgoingDict, labels)
     return None
@@ -0,0 +1,140 @@
+import gzip
+import os
+import time
+from collections import deque
+from queue import Queue, Full
+from threading import Event, Thread
+from media_classifier import AUDIO, VIDEO, SCREEN_SHARE
+
+
+class PacketRing:
+    """
+    Keeps the last few seconds of raw tshark lines for the tracked flows in memory, and writes the window around a
+    quality drop to a compressed file in the background. Dumps are rate limited so a long outage produces a bounded
+    amount of disk I/O. Only media flows carrying real traffic can trigger a dump: control and signalling flows are
+    tiny and score low every interval, which would otherwise produce a dump every min_dump_interval.
+
+    The ring is also a change detector sink, so a confirmed degradation of a flow triggers a dump as well.
+    """
+
+    def __init__(self, output_dir="quality_drops", window=30, before=20, after=10, max_records=200000,
+                 quality_threshold=4, quality_change=3, min_dump_interval=60, min_packets=50):
+        """
+        Args:
+            output_dir (str): Directory that receives the dump files.
+            window (float): Seconds of packets kept in memory.
+            before (float): Seconds before the event included in a dump.
+            after (float): Seconds after the event included in a dump; the dump is written once they have passed.
+            max_records (int): Hard limit on the number of buffered lines.
+            quality_threshold (int): Quality score at or below which a flow triggers a dump.
+            quality_change (int): Drop in quality score between two intervals that triggers a dump.
+            min_dump_interval (float): Minimum seconds between two dumps.
+            min_packets (int): Packets a flow needs in an interval for its quality score to trigger a dump.
+        """
+        self.output_dir = output_dir
+        self.window = max(window, before + after)
+        self.before = before
+        self.after = after
+        self.quality_threshold = quality_threshold
+        self.quality_change = quality_change
+        self.min_dump_interval = min_dump_interval
+        self.min_packets = min_packets
+        self._records = deque(maxlen=max_records)
+        self._last_quality = {}
+        self._last_dump = None
+        self._events = Queue(maxsize=4)
+        self._stopping = Event()
+        self._writer = Thread(target=self._write_dumps, daemon=True)
+        self._writer.start()
+
+    def add(self, arrival_time, line):
+        """
+        Buffers one packet line. Called from the analysis thread for packets of tracked flows.
+
+        Args:
+            arrival_time (float): Capture timestamp of the packet in seconds.
+            line (str): The tshark output line of the packet.
+        """
+        records = self._records
+        records.append((arrival_time, line))
+        while records[0][0] < arrival_time - self.window:
+            records.popleft()
+
+    def check_quality(self, key, quality, media_type, count):
+        """
+        Compares a flow's latest quality score with the thresholds and schedules a dump if it dropped. Flows that are
+        not labelled as media or carried fewer than min_packets packets are ignored.
+
+        Args:
+            key (tuple): Conversation key of the flow.
+            quality (int): Quality score of the last interval.
+            media_type (str): Media label of the flow.
+            count (int): Packets of the flow in the last interval.
+
+        Returns:
+            bool: True if a dump was scheduled.
+        """
+        if media_type not in (AUDIO, VIDEO, SCREEN_SHARE) or count < self.min_packets:
+            self._last_quality.pop(key, None)
+            return False
+        previous = self._last_quality.get(key)
+        self._last_quality[key] = quality
+        if quality <= self.quality_threshold:
+            reason = f"quality {quality} at or below {self.quality_threshold}"
+        elif previous is not None and previous - quality >= self.quality_change:
+            reason = f"quality dropped from {previous} to {quality}"
+        else:
+            return False
+        return self.trigger(f"{key}: {reason}")
+
+    def __call__(self, event):
+        """Change detector sink: schedules a dump when a flow's degradation is confirmed."""
+        if event['event'] == 'degradation':
+            self.trigger(f"{tuple(event['flow'])}: degradation of {', '.join(event['metrics'])}")
+
+    def trigger(self, reason):
+        """
+        Schedules a dump of the window around the most recent packet, unless one was scheduled too recently.
+
+        Args:
+            reason (str): Description written at the top of the dump.
+
+        Returns:
+            bool: True if a dump was scheduled.
+        """
+        now = time.monotonic()
+        if not self._records or (self._last_dump is not None and now - self._last_dump < self.min_dump_interval):
+            return False
+        try:
+            self._events.put_nowait((self._records[-1][0], now + self.after, reason))
+        except Full:
+            return False
+        self._last_dump = now
+        return True
+
+    def stop(self):
+        """Writes pending dumps immediately and stops the writer thread."""
+        self._stopping.set()
+        self._events.put((None, None, None))
+        self._writer.join()
+
+    def _write_dumps(self):
+        while True:
+            event_time, due, reason = self._events.get()
+            if event_time is None:
+                return
+            self._stopping.wait(max(0, due - time.monotonic()))  # Let the packets after the event arrive
+            try:
+                self._dump(event_time, reason)
+            except OSError as e:
+                print(f"Error writing quality drop capture: {e}")
+
+    def _dump(self, event_time, reason):
+        start, end = event_time - self.before, event_time + self.after
+        lines = [line for arrival_time, line in self._records.copy() if start <= arrival_time <= end]
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"quality_drop_{event_time:.0f}.txt.gz")
+        with gzip.open(path, 'wt', encoding='utf-8') as dump:
+            dump.write(f"# {reason}\n")
+            dump.writelines(lines)
+        print(f"Saved {len(lines)} packets around quality drop to {path}")
@@ -0,0 +1,158 @@
+import os
+import re
+import socket
+import time
+from queue import Queue, Empty, Full
+from threading import Event, Thread
+from summary_protocol import ACK, BATCH_HEADER, MAX_RECORDS, RECORD, pack_batch, pack_hello, pack_record
+
+
+class ProbeExporter:
+    """
+    Sends per-interval flow summaries to a collector over one persistent TCP connection. Records are batched, every
+    batch is acknowledged by the collector, and batches that could not be delivered are appended to a local spool
+    file and replayed after reconnecting. Each exporter draws a random session number, so the collector tells its
+    batches apart from those of an earlier run of the same probe and call, including ones replayed from the spool.
+    """
+
+    def __init__(self, host, port, probe_id, call_id, spool_path=None, batch_size=256,
+                 flush_interval=1.0, max_spool_bytes=50 * 1024 * 1024):
+        """
+        Args:
+            host (str): Collector host.
+            port (int): Collector port.
+            probe_id (str): Name of this probe.
+            call_id (str): Identifier of the call, shared by all probes measuring it.
+            spool_path (str): File keeping undelivered batches, named after the probe and call by default.
+            batch_size (int): Maximum records per batch.
+            flush_interval (float): Maximum seconds a record waits before its batch is sent.
+            max_spool_bytes (int): Spool size above which new undelivered batches are dropped.
+        """
+        self.address = (host, port)
+        self.hello = pack_hello(probe_id, call_id)
+        self.spool_path = spool_path or re.sub(r'[^\w.-]', '_', f"spool_{probe_id}_{call_id}.bin")
+        self.batch_size = min(batch_size, MAX_RECORDS)
+        self.flush_interval = flush_interval
+        self.max_spool_bytes = max_spool_bytes
+        self._records = Queue(maxsize=100000)
+        self._stop_event = Event()
+        self._sock = None
+        self.session = int.from_bytes(os.urandom(8), 'big')
+        self._sequence = 0
+        self._retry_at = 0.0
+        self._backoff = 1.0
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, timestamp, key, count, total_size, bitrate, jitter, latency, quality):
+        """Queues the summary of one flow over one interval. Never blocks; see pack_record for the arguments."""
+        try:
+            self._records.put_nowait(pack_record(timestamp, key, count, total_size, bitrate, jitter, latency,
+                                                 quality))
+        except Full:
+            print("Exporter queue full, dropping summary")
+
+    def stop(self):
+        """Sends the remaining records, spooling them if the collector is unreachable, and closes the connection."""
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            stopping = self._stop_event.is_set()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    if stopping:
+                        batch.append(self._records.get_nowait())
+                    else:
+                        batch.append(self._records.get(timeout=max(0, deadline - time.monotonic())))
+                except Empty:
+                    break
+            if batch:
+                self._sequence += 1
+                self._deliver(pack_batch(self.session, self._sequence, batch), self._sequence)
+            elif os.path.exists(self.spool_path):
+                self._connect()  # Replays the spool once the collector is back
+            if stopping and self._records.empty():
+                break
+        if self._sock is not None:
+            self._sock.close()
+
+    def _connect(self):
+        """Connects if needed and replays the spool. Returns True when the connection is usable."""
+        if self._sock is not None:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            self._sock = socket.create_connection(self.address, timeout=5)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sock.sendall(self.hello)
+            self._replay_spool()
+            self._backoff = 1.0
+            return True
+        except OSError as e:
+            print(f"Collector unavailable ({e}), retrying in {self._backoff:.0f}s")
+            self._disconnect()
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, 30.0)
+            return False
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _send(self, frame, sequence):
+        """Sends one batch frame and waits for its acknowledgement."""
+        self._sock.sendall(frame)
+        acknowledged = self._recv_exact(ACK.size)
+        if ACK.unpack(acknowledged)[0] != sequence:
+            raise OSError("unexpected acknowledgement")
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise OSError("collector closed the connection")
+            data += chunk
+        return data
+
+    def _deliver(self, frame, sequence):
+        if self._connect():
+            try:
+                self._send(frame, sequence)
+                return
+            except OSError as e:
+                print(f"Lost connection to collector: {e}")
+                self._disconnect()
+        self._spool(frame)
+
+    def _spool(self, frame):
+        try:
+            if os.path.exists(self.spool_path) and os.path.getsize(self.spool_path) >= self.max_spool_bytes:
+                print("Exporter spool full, dropping batch")
+                return
+            with open(self.spool_path, 'ab') as spool:
+                spool.write(frame)
+        except OSError as e:
+            print(f"Error spooling summaries: {e}")
+
+    def _replay_spool(self):
+        """Sends the spooled batches in order and removes the spool once all of them were acknowledged."""
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path, 'rb') as spool:
+            data = spool.read()
+        offset = 0
+        while offset + BATCH_HEADER.size <= len(data):
+            _, sequence, count = BATCH_HEADER.unpack_from(data, offset)
+            end = offset + BATCH_HEADER.size + count * RECORD.size
+            if end > len(data):
+                break  # Truncated by a crash while spooling
+            self._send(data[offset:end], sequence)
+            offset = end
+        os.remove(self.spool_path)
@@ -1,5 +1,12 @@
 import numpy as np
 
+# Bitrate a media type needs relative to video; the bitrate thresholds below are defined for video. Only these media
+# types are scored: non-media flows (signalling, downloads) have no quality expectation and are left out of the scores.
+BITRATE_SCALE = {
+    'video': 1.0,
+    'screen share': 0.5,
+    'audio': 0.05,
+}
 
 def calculateJitter(arrival_times):
     """
@@ -98,12 +105,13 @@ def jitter_score(jitter):
         return 3
 
 
-def bitrate_score(bitrate):
+def bitrate_score(bitrate, media_type='video'):
     """
     Generates a score from 1 to 10 based on bitrate.
 
     Parameters:
     - bitrate (int): Measured bitrate in bits per second (bps).
+    - media_type (str): Media type of the flow, a key of BITRATE_SCALE; thresholds are scaled by its entry.
 
     Returns:
     - score (float): Quality score based on bitrate (1-10).
@@ -111,6 +119,7 @@ def bitrate_score(bitrate):
     Scoring:
     - Higher bitrates yield higher scores, with gradients for smoother scoring.
     """
+    bitrate = bitrate / BITRATE_SCALE[media_type]
     if bitrate > 2000000:  # > 2 Mbps
         return 10
     elif bitrate >= 1500000:  # 1.5 to 2 Mbps
@@ -123,7 +132,7 @@ def bitrate_score(bitrate):
         return max(1, 4 - (500000 - bitrate) / 500000)
 
 
-def calculate_quality(bitrate, latency, jitter):
+def calculate_quality(bitrate, latency, jitter, media_type='video'):
     """
     Calculates an overall quality score based on bitrate, latency, and jitter.
 
@@ -131,6 +140,7 @@ def calculate_quality(bitrate, latency, jitter):
     - bitrate (int): Measured bitrate in bits per second (bps).
     - latency (float): Measured latency in milliseconds.
     - jitter (float): Measured jitter in milliseconds.
+    - media_type (str): Media type of the flow (audio, video or screen share); bitrate thresholds are scaled to it.
 
     Returns:
     - star_rating (int): Overall quality score, normalized to a 1-10 scale.
@@ -142,14 +152,16 @@ def calculate_quality(bitrate, latency, jitter):
        - Jitter: 0.3
        - Bitrate: 0.4
     3. Apply penalty factors based on thresholds:
-       - Bitrate penalties for values below 2 Mbps, with increasing penalties below 1 Mbps.
+       - Bitrate penalties for values below 2 Mbps, with increasing penalties below 1 Mbps (for video; other media
+         types use thresholds scaled by BITRATE_SCALE).
        - Latency penalties for values over 50 ms, with larger penalties for values over 200 ms.
        - Jitter penalties for values above 10 ms, with higher penalties for jitter above 25 ms.
     4. Multiply combined score by penalty factor and normalize to a 1-10 scale.
     """
     lat_score = latency_score(latency)
     jit_score = jitter_score(jitter)
-    bit_score = bitrate_score(bitrate)
+    bit_score = bitrate_score(bitrate, media_type)
+    bitrate = bitrate / BITRATE_SCALE[media_type]  # Express the bitrate on the video scale for penalties
 
     weights = {
         'latency': 0.3,
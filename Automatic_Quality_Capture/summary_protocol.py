@@ -0,0 +1,87 @@
+import ipaddress
+import struct
+
+# Wire format shared by probe_exporter.py and collector.py. All integers are big-endian.
+#   hello:  MAGIC, then probe id and call id, each as a one-byte length followed by UTF-8 bytes
+#   batch:  BATCH_HEADER (session, sequence number, record count) followed by `count` RECORDs
+#   ack:    ACK (sequence number of the last batch the collector stored)
+# The session is a random number drawn by each exporter process; sequence numbers restart at 1 in every session.
+# Batches carry their session, so batches spooled by an earlier process are replayed under their own session.
+MAGIC = b'AQC2'
+BATCH_HEADER = struct.Struct('!QIH')
+ACK = struct.Struct('!I')
+# timestamp, src ip, dest ip, src port, dest port, packets, bytes, bitrate, jitter, latency, quality
+RECORD = struct.Struct('!d16s16sHHIIfffB')
+MAX_RECORDS = 0xFFFF
+
+
+def _pack_ip(ip):
+    """Packs an IPv4 or IPv6 address into 16 bytes, using the IPv4-mapped form for IPv4."""
+    address = ipaddress.ip_address(ip)
+    if address.version == 4:
+        return b'\x00' * 10 + b'\xff\xff' + address.packed
+    return address.packed
+
+
+def _unpack_ip(packed):
+    """Returns the text form of an address packed by _pack_ip."""
+    address = ipaddress.IPv6Address(packed)
+    return str(address.ipv4_mapped or address)
+
+
+def _pack_text(text):
+    data = text.encode('utf-8')[:255]
+    return bytes((len(data),)) + data
+
+
+def pack_hello(probe_id, call_id):
+    """Returns the hello frame a probe sends when it connects."""
+    return MAGIC + _pack_text(probe_id) + _pack_text(call_id)
+
+
+def pack_record(timestamp, key, count, total_size, bitrate, jitter, latency, quality):
+    """
+    Packs the summary of one flow over one interval.
+
+    Args:
+        timestamp (float): End of the interval in seconds since the epoch.
+        key (tuple): (src_ip, dest_ip, src_port, dest_port) of the flow.
+        count (int): Packets in the interval.
+        total_size (int): Bytes in the interval.
+        bitrate (float): Bitrate in bps.
+        jitter (float): Jitter in milliseconds.
+        latency (float): Latency in milliseconds.
+        quality (int): Quality score (0-10).
+
+    Returns:
+        bytes: RECORD.size bytes.
+    """
+    src_ip, dest_ip, src_port, dest_port = key
+    return RECORD.pack(timestamp, _pack_ip(src_ip), _pack_ip(dest_ip), int(src_port), int(dest_port),
+                       min(count, 0xFFFFFFFF), min(total_size, 0xFFFFFFFF), bitrate, jitter, latency, quality)
+
+
+def unpack_record(data, offset=0):
+    """
+    Unpacks one record.
+
+    Returns:
+        dict: The record fields, with the flow key as 'flow'.
+    """
+    (timestamp, src_ip, dest_ip, src_port, dest_port, count, total_size, bitrate, jitter, latency,
+     quality) = RECORD.unpack_from(data, offset)
+    return {
+        'time': timestamp,
+        'flow': (_unpack_ip(src_ip), _unpack_ip(dest_ip), src_port, dest_port),
+        'packets': count,
+        'bytes': total_size,
+        'bitrate': bitrate,
+        'jitter': jitter,
+        'latency': latency,
+        'quality': quality,
+    }
+
+
+def pack_batch(session, sequence, records):
+    """Returns a batch frame holding already packed records."""
+    return BATCH_HEADER.pack(session, sequence, len(records)) + b''.join(records)